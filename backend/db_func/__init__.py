@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
 import os
 
 """ This 4 Lines of Code is needed, if not templates would need to be in the same folder flask was initialized"""
@@ -9,11 +11,49 @@ template_dir = os.path.join(project_root, 'templates')# Path to the templates fo
 
 app = Flask(__name__, template_folder=template_dir)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///site.db')
+
+""" SQLite Settings """
+# WAL lets readers keep going while the ingestion writer commits, NORMAL only fsyncs at checkpoints in WAL mode
+app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_CACHE_SIZE'] = int(os.getenv('SQLITE_CACHE_SIZE', -64000)) # negative is KiB, ie: 64MB
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)) # ms to wait for a lock instead of failing
+app.config['SQLITE_READ_POOL_SIZE'] = int(os.getenv('SQLITE_READ_POOL_SIZE', 8))
+
+# Readers get their own pooled engine on the same file, the default engine is left to the writer
+app.config['SQLALCHEMY_BINDS'] = {
+    'read': {
+        'url': app.config['SQLALCHEMY_DATABASE_URI'],
+        'pool_size': app.config['SQLITE_READ_POOL_SIZE'],
+    },
+}
 
 db = SQLAlchemy(app) 
 
+def set_sqlite_pragmas(dbapi_connection, read_only):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}")
+    cursor.execute(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+    cursor.execute(f"PRAGMA cache_size={app.config['SQLITE_CACHE_SIZE']}")
+    cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
 # Reason for using packages - for example, you don't need to run this app.push() func in every function called. 
 app.app_context().push()
+# Also, without packages, you will have to import app and db to every function called. 
+
+# Every new connection is set up before it is handed out by the pool
+event.listen(db.engines[None], 'connect', lambda dbapi_connection, record: set_sqlite_pragmas(dbapi_connection, False))
+event.listen(db.engines['read'], 'connect', lambda dbapi_connection, record: set_sqlite_pragmas(dbapi_connection, True))
+
+# Session for read only queries (listing, search, PnL), one per thread like db.session
+read_session = scoped_session(sessionmaker(bind=db.engines['read']))
 
-# Also, without packages, you will have to import app and db to every function called. 
\ No newline at end of file
+@app.teardown_appcontext
+def remove_read_session(exception=None):
+    read_session.remove()
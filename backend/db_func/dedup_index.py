@@ -0,0 +1,72 @@
+import os
+import threading
+
+from db_func import db, read_session
+from db_func.models import Transaction
+
+"""
+    Known exchange_id index
+    Every exchange_id in the ledger is loaded into a set once per process, the parsers check it
+    before pricing so rows we already have are dropped instead of being priced and sent to the
+    bulk insert only to be skipped there. Re-syncing history that is already saved then costs
+    the exchange requests and nothing else.
+
+    The set only grows: ids are added after every insert. The only deletes are the duplicate rows
+    retire_salted_rows removes, their salted ids are kept in the set on purpose: no fetch builds
+    a salted id anymore, so a retired id can never come back and be dropped by mistake.
+    A stale set (ie: rows inserted by another process) only lets a few known rows through to the
+    ON CONFLICT insert, it never drops a new one. Set DEDUP_PREFILTER=0 to turn it off.
+"""
+
+DEDUP_PREFILTER = os.getenv('DEDUP_PREFILTER', '1') != '0'
+LOAD_CHUNK_SIZE = 50000
+
+_known_ids = None
+_lock = threading.Lock()
+
+def get_known_ids():
+    global _known_ids
+
+    if _known_ids is None:
+        with _lock:
+            if _known_ids is None:
+                result = read_session.scalars(db.select(Transaction.exchange_id).execution_options(yield_per=LOAD_CHUNK_SIZE))
+                _known_ids = set(result)
+                print(f"Dedup index: loaded {len(_known_ids)} known exchange ids")
+
+    return _known_ids
+
+def is_known(exchange_id):
+    if not DEDUP_PREFILTER or exchange_id is None:
+        return False
+
+    return exchange_id in get_known_ids()
+
+def drop_known(records, make_id):
+    """
+    Drop the records whose exchange_id is already in the ledger.
+
+    :param records: list of raw exchange records
+    :param make_id: function(record) -> exchange_id, or None when it cannot be built yet (ie: price not cached)
+    :return: (records to keep, number dropped)
+    """
+    if not DEDUP_PREFILTER or not records:
+        return records, 0
+
+    kept = [record for record in records if not is_known(make_id(record))]
+    return kept, len(records) - len(kept)
+
+def remember_ids(exchange_ids):
+    # Not loaded yet: the first load reads them from the table anyway
+    if _known_ids is None:
+        return
+
+    with _lock:
+        _known_ids.update(exchange_ids)
+
+def reset_known_ids():
+    """Forget the loaded ids, the next check reloads them from the table."""
+    global _known_ids
+
+    with _lock:
+        _known_ids = None
@@ -1,10 +1,122 @@
-from db_func.models import Transaction
-from db_func import db 
+from db_func.models import Transaction, SyncState, PositionSnapshot, Job, BackfillCheckpoint
+from db_func import db, read_session
+from db_func.dedup_index import remember_ids
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
+import csv
+import io
+import json
+import re
 
 # creating the DB, if you want to restart the database just delete the site.db file and run this. 
 def initiate () : 
     db.create_all()
+    migrate()
+
+def migrate():
+    # create_all only creates missing tables, add indexes introduced after a table already existed
+    for index in Transaction.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    create_search_index()
+    create_position_snapshot_triggers()
+    record_salted_cutoff()
+
+def create_search_index():
+    """
+    FTS5 index over pic, exchange, exchange_id and position, kept in sync by triggers
+    so every insert path (add_txn, add_txns_bulk, raw SQL) updates it.
+    The trigram tokenizer (SQLite 3.34+) matches anywhere in a value, ie: USDT finds SOLUSDT.
+    """
+    exists = db.session.execute(db.text("SELECT sql FROM sqlite_master WHERE type='table' AND name='transaction_fts'")).first()
+
+    # Built with the default word tokenizer by an older version, recreate it (the triggers keep working)
+    if exists is not None and 'trigram' not in exists[0]:
+        db.session.execute(db.text("DROP TABLE transaction_fts"))
+        exists = None
+
+    statements = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS transaction_fts USING fts5(
+            pic, exchange, exchange_id, position, content='transaction', content_rowid='txn_id', tokenize='trigram'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS transaction_fts_insert AFTER INSERT ON "transaction" BEGIN
+            INSERT INTO transaction_fts(rowid, pic, exchange, exchange_id, position)
+            VALUES (new.txn_id, new.pic, new.exchange, new.exchange_id, new.position);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS transaction_fts_delete AFTER DELETE ON "transaction" BEGIN
+            INSERT INTO transaction_fts(transaction_fts, rowid, pic, exchange, exchange_id, position)
+            VALUES ('delete', old.txn_id, old.pic, old.exchange, old.exchange_id, old.position);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS transaction_fts_update AFTER UPDATE ON "transaction" BEGIN
+            INSERT INTO transaction_fts(transaction_fts, rowid, pic, exchange, exchange_id, position)
+            VALUES ('delete', old.txn_id, old.pic, old.exchange, old.exchange_id, old.position);
+            INSERT INTO transaction_fts(rowid, pic, exchange, exchange_id, position)
+            VALUES (new.txn_id, new.pic, new.exchange, new.exchange_id, new.position);
+        END""",
+    ]
+
+    for statement in statements:
+        db.session.execute(db.text(statement))
+
+    # Index the rows that were stored before the search index existed
+    if exists is None:
+        db.session.execute(db.text("INSERT INTO transaction_fts(transaction_fts) VALUES ('rebuild')"))
+
+    db.session.commit()
+
+def snapshot_delta_sql(row, sign):
+    # Signed (amount_bought, value_spent, amount_sold, value_sold) contributed by a trigger row (new / old)
+    buy_types = ', '.join(f"'{txn_type}'" for txn_type in BUY_TXN_TYPES)
+    sell_types = ', '.join(f"'{txn_type}'" for txn_type in SELL_TXN_TYPES)
+
+    return (
+        f"{sign} CASE WHEN {row}.txn_type IN ({buy_types}) THEN {row}.token_amt ELSE 0.0 END",
+        f"{sign} CASE WHEN {row}.txn_type IN ({buy_types}) THEN {row}.usd_value ELSE 0.0 END",
+        f"{sign} CASE WHEN {row}.txn_type IN ({sell_types}) THEN {row}.token_amt ELSE 0.0 END",
+        f"{sign} CASE WHEN {row}.txn_type IN ({sell_types}) THEN {row}.usd_value ELSE 0.0 END",
+    )
+
+def snapshot_upsert_sql(row, sign):
+    amount_bought, value_spent, amount_sold, value_sold = snapshot_delta_sql(row, sign)
+
+    return f"""
+        INSERT INTO position_snapshot (pic, exchange, position, amount_bought, value_spent, amount_sold, value_sold)
+        VALUES ({row}.pic, {row}.exchange, {row}.position, {amount_bought}, {value_spent}, {amount_sold}, {value_sold})
+        ON CONFLICT (pic, exchange, position) DO UPDATE SET
+            amount_bought = amount_bought + excluded.amount_bought,
+            value_spent = value_spent + excluded.value_spent,
+            amount_sold = amount_sold + excluded.amount_sold,
+            value_sold = value_sold + excluded.value_sold;
+    """
+
+def create_position_snapshot_triggers():
+    """
+    Keep position_snapshot in step with the ledger inside the same transaction as every
+    insert / update / delete on Transaction, whichever insert path wrote the row.
+    """
+    exists = db.session.execute(db.text("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='position_snapshot_insert'")).first()
+
+    statements = [
+        f"""CREATE TRIGGER IF NOT EXISTS position_snapshot_insert AFTER INSERT ON "transaction" BEGIN
+            {snapshot_upsert_sql('new', '+')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS position_snapshot_delete AFTER DELETE ON "transaction" BEGIN
+            {snapshot_upsert_sql('old', '-')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS position_snapshot_update AFTER UPDATE ON "transaction" BEGIN
+            {snapshot_upsert_sql('old', '-')}
+            {snapshot_upsert_sql('new', '+')}
+        END""",
+    ]
+
+    for statement in statements:
+        db.session.execute(db.text(statement))
+    db.session.commit()
+
+    # Fill the snapshot from the rows stored before the triggers existed
+    if exists is None:
+        rebuild_position_snapshot()
 
 """ Create """
 def add_txn(exchange_id_in, txn_date_in, position_in, txn_type_in, pic_in, exchange_in, token_amt_in, price_in, usd_amt_in):
@@ -28,6 +140,7 @@ def add_txn(exchange_id_in, txn_date_in, position_in, txn_type_in, pic_in, excha
         try:
             db.session.add(new_txn)
             db.session.commit()
+            remember_ids([exchange_id_in])
             print(f"Added new transaction: {exchange_id_in} \nPIC: {pic_in}, with exchange: {exchange_in}")
         except IntegrityError:
             db.session.rollback()
@@ -36,27 +149,453 @@ def add_txn(exchange_id_in, txn_date_in, position_in, txn_type_in, pic_in, excha
         print("")
         print(f"Transaction already exists: {exchange_id_in}  \nPIC: {pic_in}, with exchange: {exchange_in}. Skipping.")
 
+TXN_COLUMNS = ['exchange_id', 'txn_date', 'position', 'txn_type', 'pic', 'exchange', 'token_amt', 'token_price', 'usd_value']
+
+def add_txns_bulk(rows, chunk_size=500):
+    """
+    Insert many transactions in a single DB transaction, skipping ones already stored.
+
+    :param rows: DataFrame or list of dicts keyed by the Transaction column names
+    :return: (inserted, skipped) counts
+    """
+    if hasattr(rows, 'to_dict'):
+        rows = rows.to_dict(orient='records')
+
+    # Rows missing a required value would fail the whole batch, skip them up front
+    valid_rows = []
+    for row in rows:
+        txn = {column: row.get(column) for column in TXN_COLUMNS}
+        # value != value catches the NaN pandas puts in place of None
+        if any(value is None or value != value for value in txn.values()):
+            print(f"Missing values in transaction: {txn.get('exchange_id')}. Skipping.")
+            continue
+        valid_rows.append(txn)
+
+    inserted = 0
+    if valid_rows:
+        # ON CONFLICT DO NOTHING on exchange_id, RETURNING tells us which rows were new
+        stmt = sqlite_insert(Transaction).on_conflict_do_nothing(index_elements=['exchange_id']).returning(Transaction.exchange_id)
+
+        try:
+            for i in range(0, len(valid_rows), chunk_size):
+                result = db.session.execute(stmt, valid_rows[i:i + chunk_size])
+                inserted += len(result.all())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Inserted or already there, every one of them is in the ledger now
+        remember_ids(row['exchange_id'] for row in valid_rows)
+
+    skipped = len(rows) - inserted
+    print(f"Bulk insert: {inserted} added, {skipped} skipped")
+    return inserted, skipped
+
 
 """ Read """
 def get_all():
-    return Transaction.query.all() 
+    return read_session.query(Transaction).all() 
 
 def get_by_pic(pic_in):
-    return Transaction.query.filter_by(pic=pic_in).all()
+    return read_session.query(Transaction).filter_by(pic=pic_in).all()
 
 def get_by_pic_and_exchange(pic_in, exchange_in):
-    return Transaction.query.filter_by(pic=pic_in, exchange=exchange_in).all
+    return read_session.query(Transaction).filter_by(pic=pic_in, exchange=exchange_in).all()
+
+def get_positions(pic_in, exchange_in):
+    # Distinct positions (symbols for trades, coins for deposits / withdrawals) already stored for an owner
+    rows = read_session.query(Transaction.position).filter_by(pic=pic_in, exchange=exchange_in).distinct().all()
+    return [row[0] for row in rows]
+
+""" Paginated Read """
+TXN_FILTER_FIELDS = ['pic', 'exchange', 'position', 'txn_type']
+
+def filter_transactions(query, filters):
+    """
+    Apply equality filters and an inclusive txn_date range (date_from / date_to, YYYY-MM-DD).
+    """
+    for field in TXN_FILTER_FIELDS:
+        if filters.get(field):
+            query = query.filter(getattr(Transaction, field) == filters[field])
+
+    if filters.get('date_from'):
+        query = query.filter(Transaction.txn_date >= filters['date_from'])
+    if filters.get('date_to'):
+        query = query.filter(Transaction.txn_date <= filters['date_to'])
+
+    return query
+
+PAGE_LIMIT_MAX = 1000
+PAGE_FIELDS = [column.name for column in Transaction.__table__.columns]
+
+def parse_cursor(cursor):
+    """Split a "txn_date|txn_id" cursor, raises ValueError if it is not one we handed out."""
+    cursor_date, cursor_id = cursor.rsplit('|', 1)
+    datetime.strptime(cursor_date, '%Y-%m-%d')
+    return cursor_date, int(cursor_id)
+
+def parse_fields(fields):
+    """Split a comma separated list of columns, raises ValueError naming any unknown one."""
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in PAGE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+def get_transaction_page(filters, cursor=None, limit=100, fields=None):
+    """
+    Keyset pagination over the ledger, newest first.
+
+    :param filters: Dictionary of filters, see filter_transactions
+    :param cursor: "txn_date|txn_id" of the last row of the previous page
+    :param limit: Page size, clamped to [1, PAGE_LIMIT_MAX]
+    :param fields: Optional list of columns to return (see parse_fields), defaults to all
+    :return: Dictionary with the page of transactions and the cursor for the next page
+    """
+    fields = fields or PAGE_FIELDS
+    limit = min(max(limit, 1), PAGE_LIMIT_MAX)
+
+    # The cursor columns are always needed to build the next cursor
+    selected = list(dict.fromkeys(fields + ['txn_date', 'txn_id']))
+    query = read_session.query(*[getattr(Transaction, field) for field in selected])
+    query = filter_transactions(query, filters)
+
+    if cursor:
+        query = query.filter(db.tuple_(Transaction.txn_date, Transaction.txn_id) < parse_cursor(cursor))
+
+    # Fetch one extra row to know if there is a next page
+    rows = query.order_by(Transaction.txn_date.desc(), Transaction.txn_id.desc()).limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = f"{rows[-1].txn_date}|{rows[-1].txn_id}" if has_next else None
+
+    return {
+        'transactions': [{field: getattr(row, field) for field in fields} for row in rows],
+        'next_cursor': next_cursor
+    }
+
+def count_transactions(filters):
+    return filter_transactions(read_session.query(db.func.count(Transaction.txn_id)), filters).scalar()
+
+""" Streaming Export """
+def iter_transactions(chunk_size=1000):
+    """
+    Iterate the whole ledger as dictionaries without loading it into memory.
+    Rows are pulled from the cursor chunk_size at a time.
+    """
+    columns = Transaction.__table__.columns
+    result = read_session.execute(
+        db.select(*columns).order_by(Transaction.txn_id).execution_options(stream_results=True, yield_per=chunk_size)
+    )
+
+    for partition in result.partitions():
+        for row in partition:
+            yield row._asdict()
+
+def export_transactions(export_format='ndjson', chunk_size=1000):
+    """
+    Yield the ledger as NDJSON lines or CSV text, one chunk of rows per yielded string.
+    """
+    column_names = [column.name for column in Transaction.__table__.columns]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=column_names)
+
+    if export_format == 'csv':
+        writer.writeheader()
+
+    count = 0
+    for row in iter_transactions(chunk_size):
+        if export_format == 'csv':
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row) + '\n')
+
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
 
 # Function for search functionality
-def search_transactions(search_term):
-    return Transaction.query.filter(
-        db.or_(
-            Transaction.pic.ilike(f"%{search_term}%"),
-            Transaction.exchange.ilike(f"%{search_term}%"),
-            Transaction.exchange_id.ilike(f"%{search_term}%"),
-        )
+SEARCH_COLUMNS = ['pic', 'exchange', 'exchange_id', 'position']
+
+def search_transactions(search_term, limit=100):
+    """
+    Full text search over pic, exchange, exchange_id and position using the FTS5 index.
+    Every word of the search term is matched anywhere in a value (like ILIKE '%word%'), best matches first.
+    Trigrams need 3 characters, shorter words are filtered with LIKE instead.
+    """
+    words = re.findall(r'\w+', search_term or '')
+    if not words:
+        return []
+
+    long_words = [word for word in words if len(word) >= 3]
+    short_words = [word for word in words if len(word) < 3]
+    conditions = []
+    params = {'limit': limit}
+
+    if long_words:
+        conditions.append("transaction_fts MATCH :query")
+        params['query'] = ' '.join(f'"{word}"' for word in long_words)
+    for i, word in enumerate(short_words):
+        conditions.append('(' + ' OR '.join(f"{column} LIKE :word{i}" for column in SEARCH_COLUMNS) + ')')
+        params[f"word{i}"] = f"%{word}%"
+
+    order = 'rank' if long_words else 'rowid DESC'
+    rows = read_session.execute(
+        db.text(f"SELECT rowid FROM transaction_fts WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT :limit"),
+        params
     ).all()
 
+    txn_ids = [row[0] for row in rows]
+    transactions = {txn.txn_id: txn for txn in read_session.query(Transaction).filter(Transaction.txn_id.in_(txn_ids)).all()}
+
+    return [transactions[txn_id] for txn_id in txn_ids if txn_id in transactions]
+
+""" Aggregates """
+# Transaction types that add to / take from a position, used by the PnL calculation
+BUY_TXN_TYPES = ['Buy', 'Deposit', 'Rebate', 'Revenue', 'Commision']
+SELL_TXN_TYPES = ['Sell', 'Withdraw', 'Fee']
+
+def get_position_totals():
+    """
+    Sum bought / sold amounts and values per (pic, exchange, position) in SQL.
+
+    :return: List of dictionaries, one per position, instead of one per transaction
+    """
+    is_buy = Transaction.txn_type.in_(BUY_TXN_TYPES)
+    is_sell = Transaction.txn_type.in_(SELL_TXN_TYPES)
+
+    rows = read_session.query(
+        Transaction.pic,
+        Transaction.exchange,
+        Transaction.position,
+        db.func.sum(db.case((is_buy, Transaction.token_amt), else_=0.0)).label('amount_bought'),
+        db.func.sum(db.case((is_buy, Transaction.usd_value), else_=0.0)).label('value_spent'),
+        db.func.sum(db.case((is_sell, Transaction.token_amt), else_=0.0)).label('amount_sold'),
+        db.func.sum(db.case((is_sell, Transaction.usd_value), else_=0.0)).label('value_sold'),
+    ).group_by(Transaction.pic, Transaction.exchange, Transaction.position).all()
+
+    return [row._asdict() for row in rows]
+
+def get_position_snapshot():
+    """
+    Read the incrementally maintained totals, same shape as get_position_totals.
+    """
+    columns = ['pic', 'exchange', 'position', 'amount_bought', 'value_spent', 'amount_sold', 'value_sold']
+    rows = read_session.query(*[getattr(PositionSnapshot, column) for column in columns]).all()
+
+    return [row._asdict() for row in rows]
+
+def rebuild_position_snapshot(tolerance=1e-6):
+    """
+    Check the snapshot against a full recompute from the ledger, then replace it with the recompute.
+
+    :return: Dictionary with the number of positions checked and the ones that did not match
+    """
+    value_columns = ['amount_bought', 'value_spent', 'amount_sold', 'value_sold']
+    key = lambda row: (row['pic'], row['exchange'], row['position'])
+
+    recomputed = {key(row): row for row in get_position_totals()}
+    snapshot = {key(row): row for row in get_position_snapshot()}
+
+    mismatched = []
+    for position_key in recomputed.keys() | snapshot.keys():
+        expected = recomputed.get(position_key)
+        actual = snapshot.get(position_key)
+
+        if expected is None or actual is None or any(
+            abs(expected[column] - actual[column]) > tolerance * max(1.0, abs(expected[column]))
+            for column in value_columns
+        ):
+            mismatched.append({'position': position_key, 'expected': expected, 'snapshot': actual})
+
+    try:
+        db.session.query(PositionSnapshot).delete()
+        if recomputed:
+            db.session.execute(db.insert(PositionSnapshot), list(recomputed.values()))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    print(f"Position snapshot rebuilt: {len(recomputed)} positions, {len(mismatched)} mismatched")
+    return {'checked': len(recomputed), 'mismatched': mismatched}
+
+def get_by_positions(pic_in, exchange_in, positions_in):
+    return read_session.query(Transaction).filter(
+        Transaction.pic == pic_in,
+        Transaction.exchange == exchange_in,
+        Transaction.position.in_(positions_in),
+    ).order_by(Transaction.txn_date).all()
+
+""" Sync State """
+def get_sync_state(pic_in, exchange_in, stream_in):
+    return SyncState.query.filter_by(pic=pic_in, exchange=exchange_in, stream=stream_in).first()
+
+def set_sync_state(pic_in, exchange_in, stream_in, last_id_in=None, last_time_in=None):
+    # Upsert the watermark for a stream, only overwriting the fields that were given
+    state = get_sync_state(pic_in, exchange_in, stream_in)
+
+    if state is None:
+        state = SyncState(pic=pic_in, exchange=exchange_in, stream=stream_in)
+        db.session.add(state)
+
+    if last_id_in is not None:
+        state.last_id = last_id_in
+    if last_time_in is not None:
+        state.last_time = last_time_in
+    state.updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    db.session.commit()
+    return state
+
+""" Salted Binance Ids """
+# Binance rows used to be stored under ids salted with datetime.now(), re-fetching them inserts a
+# second copy. The old ids cannot be recomputed (the exchange trade / tx ids were never stored),
+# so every re-fetched row retires one older row with the same content instead.
+SALTED_CUTOFF = ('*', 'binance', 'salted_ids') # last_id: newest Binance txn_id stored under a salted id
+SALTED_CHECKED = ('*', 'binance', 'salted_ids_checked') # last_id: newest row already matched
+SALTED_MATCH_FIELDS = ['pic', 'txn_date', 'position', 'txn_type', 'token_amt']
+
+def record_salted_cutoff():
+    # Only the first migrate() with deterministic ids records it, 0 on a ledger without Binance rows
+    if get_sync_state(*SALTED_CUTOFF) is None:
+        last_id = db.session.query(db.func.max(Transaction.txn_id)).filter(Transaction.exchange == 'binance').scalar()
+        set_sync_state(*SALTED_CUTOFF, last_id_in=last_id or 0)
+
+def retire_salted_rows(chunk_size=500):
+    """
+    Delete the salted Binance rows that were fetched again under their deterministic id.
+    Each row newer than the cutoff retires at most one row at or below it with the same
+    pic, date, position, type and amount, so repeated fills are matched one to one.
+
+    :return: number of rows deleted
+    """
+    cutoff = get_sync_state(*SALTED_CUTOFF)
+    if cutoff is None or not cutoff.last_id:
+        return 0
+
+    checked = get_sync_state(*SALTED_CHECKED)
+    checked_id = checked.last_id if checked is not None else cutoff.last_id
+    match_columns = [getattr(Transaction, field) for field in SALTED_MATCH_FIELDS]
+
+    new_rows = db.session.query(Transaction.txn_id, *match_columns).filter(
+        Transaction.exchange == 'binance',
+        Transaction.txn_id > checked_id,
+    ).order_by(Transaction.txn_id).all()
+    if not new_rows:
+        return 0
+
+    old_ids = {} # match key -> salted txn_ids, oldest first
+    old_rows = db.session.query(Transaction.txn_id, *match_columns).filter(
+        Transaction.exchange == 'binance',
+        Transaction.txn_id <= cutoff.last_id,
+        Transaction.txn_date.in_({row.txn_date for row in new_rows}),
+    ).order_by(Transaction.txn_id)
+    for row in old_rows:
+        old_ids.setdefault(tuple(row[1:]), []).append(row.txn_id)
+
+    retired = [old_ids[tuple(row[1:])].pop(0) for row in new_rows if old_ids.get(tuple(row[1:]))]
+
+    try:
+        for i in range(0, len(retired), chunk_size):
+            Transaction.query.filter(Transaction.txn_id.in_(retired[i:i + chunk_size])).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    set_sync_state(*SALTED_CHECKED, last_id_in=new_rows[-1].txn_id)
+
+    if retired:
+        print(f"Retired {len(retired)} salted Binance rows fetched again under deterministic ids")
+    return len(retired)
+
+""" Backfill Checkpoints """
+def get_checkpoint(pic_in, exchange_in, stream_in, range_start_in):
+    return BackfillCheckpoint.query.filter_by(pic=pic_in, exchange=exchange_in, stream=stream_in, range_start=range_start_in).first()
+
+def set_checkpoint(pic_in, exchange_in, stream_in, range_start_in, done_until_in):
+    # Called by the writer once a window's rows are committed
+    checkpoint = get_checkpoint(pic_in, exchange_in, stream_in, range_start_in)
+
+    if checkpoint is None:
+        checkpoint = BackfillCheckpoint(pic=pic_in, exchange=exchange_in, stream=stream_in, range_start=range_start_in)
+        db.session.add(checkpoint)
+
+    checkpoint.done_until = done_until_in
+    checkpoint.updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    db.session.commit()
+    return checkpoint
+
+def clear_checkpoint(pic_in, exchange_in, stream_in, range_start_in):
+    # A finished backfill has nothing to resume
+    BackfillCheckpoint.query.filter_by(pic=pic_in, exchange=exchange_in, stream=stream_in, range_start=range_start_in).delete()
+    db.session.commit()
+
+""" Jobs """
+def create_job(job_type_in, params_in):
+    job = Job(
+        job_type=job_type_in,
+        status='queued',
+        params=json.dumps(params_in),
+        created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def get_job(job_id_in):
+    # populate_existing, the runner keeps updating the row from another session
+    return read_session.get(Job, job_id_in, populate_existing=True)
+
+def get_jobs(status_in=None, limit=20):
+    query = read_session.query(Job)
+    if status_in is not None:
+        query = query.filter(Job.status.in_(status_in))
+    return query.order_by(Job.job_id.desc()).limit(limit).populate_existing().all()
+
+def update_job(job_id_in, **fields):
+    # Written by the job runner thread, the only writer for its own job
+    db.session.query(Job).filter_by(job_id=job_id_in).update(fields)
+    db.session.commit()
+
+""" Query Plans """
+def explain_query_plans(pic_in='Jansen', exchange_in='binance', search_term='SOL'):
+    """
+    Run EXPLAIN QUERY PLAN for every query in this module.
+
+    :return: Dictionary of query name -> list of plan steps
+    """
+    queries = {
+        'add_txn': Transaction.query.filter_by(exchange_id='0', pic=pic_in, exchange=exchange_in),
+        'get_all': Transaction.query,
+        'get_by_pic': Transaction.query.filter_by(pic=pic_in),
+        'get_by_pic_and_exchange': Transaction.query.filter_by(pic=pic_in, exchange=exchange_in),
+        'get_positions': db.session.query(Transaction.position).filter_by(pic=pic_in, exchange=exchange_in).distinct(),
+        'search_transactions': f"SELECT rowid FROM transaction_fts WHERE transaction_fts MATCH '\"{search_term}\"' ORDER BY rank LIMIT 100",
+        'get_position_totals': db.session.query(Transaction.pic, Transaction.exchange, Transaction.position, db.func.sum(Transaction.token_amt)).group_by(Transaction.pic, Transaction.exchange, Transaction.position),
+        'get_transaction_page': Transaction.query.filter_by(pic=pic_in).order_by(Transaction.txn_date.desc(), Transaction.txn_id.desc()).limit(100),
+        'get_sync_state': SyncState.query.filter_by(pic=pic_in, exchange=exchange_in, stream='trades'),
+    }
+
+    plans = {}
+    for name, query in queries.items():
+        if isinstance(query, str):
+            sql = query
+        else:
+            sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        plans[name] = [row[-1] for row in rows]
+
+    return plans
+
 # The two functions below are for converting the transaction model to a dictionary 
 def query_to_dict(query_results):
     """
@@ -0,0 +1,157 @@
+import os
+import shutil
+
+import pandas as pd
+
+from db_func import app, db, read_session
+from db_func.models import Transaction, SyncState
+from db_func.funcs import get_sync_state, set_sync_state
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError: # Optional, without it PnL and reporting keep reading through the ORM
+    pa = None
+
+"""
+    Columnar snapshot of the ledger
+    The Transaction table is mirrored to Parquet files partitioned by pic / exchange / year
+    (hive layout, ie: pic=Jansen/exchange=binance/year=2024/part-....parquet).
+
+    New rows are appended incrementally: every row with a txn_id above the watermark (kept in
+    SyncState) is written as new files. Rows are only deleted by retire_salted_rows (duplicate
+    Binance rows under salted ids), update_db then rebuilds the whole snapshot instead.
+    Only the writer side appends (after every update, or the snapshot-ledger command), readers
+    memory map the files, only load the columns they ask for and never write.
+"""
+
+SNAPSHOT_PATH = os.getenv('LEDGER_SNAPSHOT_PATH', os.path.join(app.instance_path, 'ledger_snapshot'))
+CHUNK_SIZE = int(os.getenv('LEDGER_SNAPSHOT_CHUNK_SIZE', 100000))
+
+# Watermark row in SyncState, last_id is the highest txn_id written to the snapshot
+WATERMARK = ('*', '*', 'ledger_snapshot')
+
+TXN_FIELDS = [column.name for column in Transaction.__table__.columns]
+PARTITION_FIELDS = ['pic', 'exchange', 'year']
+
+def snapshot_available():
+    return pa is not None
+
+def snapshot_is_current():
+    """True when the snapshot holds every transaction, read only so it is safe on GET routes."""
+    if pa is None or not os.path.isdir(SNAPSHOT_PATH):
+        return False
+
+    watermark = read_session.query(SyncState.last_id).filter_by(pic=WATERMARK[0], exchange=WATERMARK[1], stream=WATERMARK[2]).scalar()
+    last_id = read_session.query(db.func.max(Transaction.txn_id)).scalar()
+    return watermark is not None and watermark >= (last_id or 0)
+
+def get_schema():
+    return pa.schema([
+        ('txn_id', pa.int64()),
+        ('exchange_id', pa.string()),
+        ('txn_date', pa.string()),
+        ('exchange', pa.string()),
+        ('pic', pa.string()),
+        ('position', pa.string()),
+        ('txn_type', pa.string()),
+        # Declared as Integer on the model but stored as floats
+        ('token_amt', pa.float64()),
+        ('token_price', pa.float64()),
+        ('usd_value', pa.float64()),
+        ('year', pa.string()),
+    ])
+
+def get_partitioning():
+    schema = get_schema()
+    return ds.partitioning(pa.schema([schema.field(name) for name in PARTITION_FIELDS]), flavor='hive')
+
+def write_chunk(rows):
+    columns = {name: [row[index] for row in rows] for index, name in enumerate(TXN_FIELDS)}
+    columns['year'] = [txn_date[:4] for txn_date in columns['txn_date']]
+    table = pa.table(columns, schema=get_schema())
+
+    # Named after the first txn_id, so a chunk re-written after a crash replaces its own files
+    ds.write_dataset(
+        table,
+        SNAPSHOT_PATH,
+        format='parquet',
+        partitioning=get_partitioning(),
+        basename_template=f"part-{rows[0][0]:012d}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+def write_ledger_snapshot(rebuild=False, chunk_size=CHUNK_SIZE):
+    """
+    Append every transaction newer than the watermark to the Parquet snapshot.
+
+    :param rebuild: Drop the snapshot and write the whole ledger again (also compacts small appends)
+    :return: dict with the number of rows written and the new watermark
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed, the ledger snapshot is unavailable")
+
+    state = get_sync_state(*WATERMARK)
+    last_id = 0 if rebuild or state is None or state.last_id is None else state.last_id
+
+    if rebuild and os.path.exists(SNAPSHOT_PATH):
+        shutil.rmtree(SNAPSHOT_PATH)
+
+    columns = [getattr(Transaction, name) for name in TXN_FIELDS]
+    result = read_session.execute(
+        db.select(*columns)
+        .where(Transaction.txn_id > last_id)
+        .order_by(Transaction.txn_id)
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    )
+
+    written = 0
+    for partition in result.partitions():
+        write_chunk(partition)
+        written += len(partition)
+        last_id = partition[-1][0]
+
+    # Only move the watermark once the files are on disk
+    if written or rebuild:
+        set_sync_state(*WATERMARK, last_id_in=last_id)
+        print(f"Ledger snapshot: wrote {written} rows, watermark at txn_id {last_id}")
+
+    return {'written': written, 'last_id': last_id}
+
+def get_dataset():
+    if not os.path.isdir(SNAPSHOT_PATH):
+        return None
+
+    # Memory map the files instead of copying them into Arrow buffers
+    filesystem = pafs.LocalFileSystem(use_mmap=True)
+    return ds.dataset(SNAPSHOT_PATH, format='parquet', partitioning=get_partitioning(), filesystem=filesystem)
+
+def load_ledger(columns=None, filters=None, refresh=False):
+    """
+    Load the ledger from the Parquet snapshot as a DataFrame.
+
+    :param columns: Only read these columns, defaults to every Transaction column
+    :param filters: Optional dict of column -> value, pic / exchange / year only open the matching partitions
+    :param refresh: Append new transactions to the snapshot first, writer side only
+    """
+    if refresh:
+        write_ledger_snapshot()
+
+    columns = columns or TXN_FIELDS
+    dataset = get_dataset()
+    if dataset is None:
+        return pd.DataFrame(columns=columns)
+
+    expression = None
+    for field, value in (filters or {}).items():
+        condition = ds.field(field) == value
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+def load_transactions(filters=None):
+    """Every transaction as a list of dictionaries, same shape as get_as_dict(get_all)."""
+    df = load_ledger(filters=filters).sort_values('txn_id')
+    return df.to_dict('records')
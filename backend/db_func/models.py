@@ -12,6 +12,79 @@ class Transaction (db.Model) :
     token_price = db.Column(db.Integer, nullable=False)
     usd_value = db.Column(db.Integer, nullable=False)
 
+    # exchange_id lookups (add_txn) are already served by its unique index
+    __table_args__ = (
+        db.Index('ix_transaction_pic_exchange_position_type', 'pic', 'exchange', 'position', 'txn_type'), # get_by_pic, get_positions, PnL grouping
+        db.Index('ix_transaction_date_id', 'txn_date', 'txn_id'), # Ordering by date
+    )
+
     # what do you want to show when you print the Transaction instance
     def __repr__(self) -> str:
         return f"Transaction ID : {self.txn_id}, Exchange ID : {self.txn_id} txn_date : {self.txn_date}, exchange : {self.exchange}, pic : {self.pic}, position : {self.position}, txn_type : {self.txn_type}, token_amt : {self.token_amt}, token_price : {self.token_price}, usd_amt : {self.usd_value}"
+
+
+class SyncState (db.Model) :
+    # Per (pic, exchange, stream) watermark so the next sync only fetches new records
+    sync_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    pic = db.Column(db.String, nullable=False)
+    exchange = db.Column(db.String, nullable=False)
+    stream = db.Column(db.String, nullable=False) # ie: trades:SOLUSDT
+    last_id = db.Column(db.Integer, nullable=True) # last seen exchange trade id
+    last_time = db.Column(db.Integer, nullable=True) # last synced unix time (ms)
+    updated_at = db.Column(db.String, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('pic', 'exchange', 'stream', name='uq_sync_state_stream'),)
+
+    def __repr__(self) -> str:
+        return f"SyncState pic : {self.pic}, exchange : {self.exchange}, stream : {self.stream}, last_id : {self.last_id}, last_time : {self.last_time}, updated_at : {self.updated_at}"
+
+
+class PositionSnapshot (db.Model) :
+    # Running totals per (pic, exchange, position), kept up to date by triggers on Transaction inserts
+    snapshot_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    pic = db.Column(db.String, nullable=False)
+    exchange = db.Column(db.String, nullable=False)
+    position = db.Column(db.String, nullable=False)
+    amount_bought = db.Column(db.Float, nullable=False, default=0.0)
+    value_spent = db.Column(db.Float, nullable=False, default=0.0)
+    amount_sold = db.Column(db.Float, nullable=False, default=0.0)
+    value_sold = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (db.UniqueConstraint('pic', 'exchange', 'position', name='uq_position_snapshot'),)
+
+    def __repr__(self) -> str:
+        return f"PositionSnapshot pic : {self.pic}, exchange : {self.exchange}, position : {self.position}, amount_bought : {self.amount_bought}, value_spent : {self.value_spent}, amount_sold : {self.amount_sold}, value_sold : {self.value_sold}"
+
+
+class Job (db.Model) :
+    # Background work started from the API (ie: /db_update), progress is a JSON document updated while it runs
+    job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_type = db.Column(db.String, nullable=False) # ie: db_update
+    status = db.Column(db.String, nullable=False) # queued / running / done / failed
+    params = db.Column(db.String, nullable=False) # JSON
+    progress = db.Column(db.String, nullable=True) # JSON
+    error = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.String, nullable=False)
+    started_at = db.Column(db.String, nullable=True)
+    finished_at = db.Column(db.String, nullable=True)
+
+    __table_args__ = (db.Index('ix_job_status', 'status'),)
+
+    def __repr__(self) -> str:
+        return f"Job ID : {self.job_id}, job_type : {self.job_type}, status : {self.status}, created_at : {self.created_at}, started_at : {self.started_at}, finished_at : {self.finished_at}"
+
+
+class BackfillCheckpoint (db.Model) :
+    # How far a window by window backfill got, so a restarted run continues from the last saved window
+    checkpoint_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    pic = db.Column(db.String, nullable=False)
+    exchange = db.Column(db.String, nullable=False)
+    stream = db.Column(db.String, nullable=False) # ie: J:trades
+    range_start = db.Column(db.Integer, nullable=False) # unix time (ms) the backfill started from
+    done_until = db.Column(db.Integer, nullable=False) # every window before this unix time (ms) is saved
+    updated_at = db.Column(db.String, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('pic', 'exchange', 'stream', 'range_start', name='uq_backfill_checkpoint'),)
+
+    def __repr__(self) -> str:
+        return f"BackfillCheckpoint pic : {self.pic}, exchange : {self.exchange}, stream : {self.stream}, range_start : {self.range_start}, done_until : {self.done_until}, updated_at : {self.updated_at}"
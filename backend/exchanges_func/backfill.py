@@ -0,0 +1,61 @@
+from datetime import datetime
+
+# External Imports
+from db_func.funcs import get_checkpoint, set_checkpoint, clear_checkpoint
+from exchanges_func.utils import convert_to_unix
+
+"""
+    Checkpointed backfills
+    Window by window fetches (ie: 1-day trade windows since 2023) hand every window to the
+    writer as soon as it is fetched instead of collecting the whole range in memory.
+    Once a window is committed the writer moves the checkpoint to its end, a restarted run
+    with the same start continues from there. The checkpoint is removed when the range is done.
+
+    A window that could not be fetched completely stops the checkpoint from moving,
+    later windows are still saved and the failed one is fetched again on the next run.
+"""
+
+def iter_checkpointed(owner_data, exchange, stream, start_date, end_date, iter_windows, parse):
+    """
+    Yield (df, on_saved) per window, on_saved must only be called once df is in the database.
+
+    :param stream: Checkpoint name within the owner, ie: trades
+    :param iter_windows: function(start_date, end_date) yielding (window_start, window_end, records, complete)
+    :param parse: function(records) -> DataFrame
+    """
+    pic = owner_data['pic']
+    stream = f"{owner_data['owner']}:{stream}"
+    range_start = convert_to_unix(start_date)
+
+    checkpoint = get_checkpoint(pic, exchange, stream, range_start)
+    if checkpoint is not None and checkpoint.done_until > range_start:
+        start_date = datetime.fromtimestamp(checkpoint.done_until / 1000)
+        print(f"{exchange}: resuming {stream} backfill from {start_date}")
+
+    failed = 0
+    pending = None # Held back one window so the last one can clear the checkpoint instead
+
+    for window_start, window_end, records, complete in iter_windows(start_date, end_date):
+        if pending is not None:
+            yield pending
+
+        if not complete:
+            failed += 1
+            print(f"{exchange}: window {window_start} to {window_end} of {stream} incomplete, the checkpoint stays before it")
+
+        done_until = convert_to_unix(window_end)
+        on_saved = None
+        if not failed:
+            on_saved = lambda done_until=done_until: set_checkpoint(pic, exchange, stream, range_start, done_until)
+        df = parse(records)
+        df.attrs['complete'] = complete
+        pending = (df, on_saved)
+
+    if pending is not None:
+        df, on_saved = pending
+        if not failed:
+            on_saved = lambda: clear_checkpoint(pic, exchange, stream, range_start)
+        yield df, on_saved
+
+    if failed:
+        raise RuntimeError(f"{failed} {exchange} windows of {stream} failed, the next run resumes from the checkpoint")
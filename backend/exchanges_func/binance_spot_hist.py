@@ -1,12 +1,17 @@
 # Base Imports
 import hashlib
 import hmac
+import threading
 import time
 from datetime import timedelta
 
 # External Imports
-from exchanges_func.utils import convert_timestamp_to_date, generate_custom_uuid, get_bin_hist_price, get_binance_symbols, extract_date, convert_to_unix, assign_time, process_owners
-from db_func.funcs import add_txn
+from exchanges_func.utils import convert_timestamp_to_date, generate_custom_uuid, get_bin_hist_prices, get_binance_symbols, extract_date, convert_to_unix, convert_to_unix_v2, peek_hist_prices
+from exchanges_func.rate_limiter import acquire
+from exchanges_func import http_client
+from exchanges_func.backfill import iter_checkpointed
+from db_func.funcs import add_txns_bulk, get_positions, get_sync_state, set_sync_state
+from db_func.dedup_index import is_known, drop_known
 import pandas as pd
 import requests
 
@@ -26,6 +31,7 @@ def get_binance_trade_history(bin_api_key, bin_secret_key, start_time, end_time,
     base_url = 'https://api.binance.com'
     limit = 1000
 
+    acquire('binance', bin_api_key, weight=20)
     timestamp = int(time.time() * 1000)
     params = f'timestamp={timestamp}&limit={limit}&startTime={start_time}&endTime={end_time}&symbol={symbol}'
     signature = hmac.new(bin_secret_key.encode('utf-8'), params.encode('utf-8'), hashlib.sha256).hexdigest()
@@ -36,7 +42,7 @@ def get_binance_trade_history(bin_api_key, bin_secret_key, start_time, end_time,
 
     url = f"{base_url}/api/v3/myTrades?{params}&signature={signature}"
         
-    response = requests.get(url, headers=headers)
+    response = http_client.get('binance', url, headers=headers, api_key=bin_api_key)
 
     if response.status_code == 200:
         data = response.json()
@@ -46,20 +52,82 @@ def get_binance_trade_history(bin_api_key, bin_secret_key, start_time, end_time,
     else:
         print(f"Error: Received status code {response.status_code} for symbol {symbol} with start_time {start_time} and end_time {end_time}")
         print(response.text)
-        return []
+        return None
+
+def get_binance_trades_from_id(bin_api_key, bin_secret_key, symbol, from_id):
+    base_url = 'https://api.binance.com'
+    limit = 1000
+
+    acquire('binance', bin_api_key, weight=20)
+    timestamp = int(time.time() * 1000)
+    params = f'timestamp={timestamp}&limit={limit}&fromId={from_id}&symbol={symbol}'
+    signature = hmac.new(bin_secret_key.encode('utf-8'), params.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    headers = {
+        'X-MBX-APIKEY': bin_api_key
+    }
+
+    url = f"{base_url}/api/v3/myTrades?{params}&signature={signature}"
+
+    response = http_client.get('binance', url, headers=headers, api_key=bin_api_key)
+
+    if response.status_code == 200:
+        data = response.json()
+        return data if data else []
+    elif response.status_code == 429:
+        raise WeightLimitExceeded(response.json().get('msg', 'Weight limit exceeded'))
+    else:
+        print(f"Error: Received status code {response.status_code} for symbol {symbol} with fromId {from_id}")
+        print(response.text)
+        return None
+
+def loop_get_binance_trades_from_id(bin_api_key, bin_secret_key, symbol, from_id, max_retries=5, retry_delay=60):
+    """
+        Page through /api/v3/myTrades with fromId until a page comes back short.
+        Returns (trades with id >= from_id for the symbol, complete), complete is False if a page failed.
+    """
+    limit = 1000
+    trade_history_full = []
+
+    while True:
+        retry_count = 0
+        page = None
+
+        while retry_count < max_retries:
+            try:
+                page = get_binance_trades_from_id(bin_api_key, bin_secret_key, symbol, from_id)
+                break
+            except WeightLimitExceeded as e:
+                # The limiter is paused for Retry-After, the next acquire waits it out
+                print(f"Weight limit exceeded: {e}. Retrying...")
+                retry_count += 1
+            except requests.exceptions.RequestException as e:
+                print(f"Error occurred: {e}. Retrying in {retry_delay} seconds...")
+                time.sleep(retry_delay)
+                retry_count += 1
 
-def loop_get_binance_history(bin_api_key, bin_secret_key, start_date, end_date, binance_symbols, max_retries=5, retry_delay=60):
+        if page is None:
+            print(f"Failed to fetch data for {symbol} after {max_retries} attempts. Skipping...")
+            return trade_history_full, False
 
+        trade_history_full.extend(page)
+
+        if len(page) < limit:
+            return trade_history_full, True
+
+        from_id = page[-1].get('id') + 1
+
+def iter_binance_history(bin_api_key, bin_secret_key, start_date, end_date, binance_symbols, max_retries=5, retry_delay=60):
+    """
+        Walk the range in 1-day windows, querying every symbol in each one.
+        Yields (window_start, window_end, trades, complete), complete is False if a symbol was skipped.
+    """
     unix_start = convert_to_unix(start_date)
     unix_end = convert_to_unix(end_date)
 
     print(f"Binance: Full unix range {unix_start} to {unix_end}")
 
     current_start_time = start_date
-    trade_history_full = []
-    weight_used = 0
-    weight_limit = 6000
-    weight_reset_time = time.time() + 60  # Reset weight after 1 minute
 
     while current_start_time < end_date:
         current_end_time = min(current_start_time + timedelta(days=1), end_date)
@@ -69,6 +137,9 @@ def loop_get_binance_history(bin_api_key, bin_secret_key, start_date, end_date,
 
         print(f"Starting at {unix_start}, ending at {unix_end}")
 
+        trade_history_in_range = []
+        complete = True
+
         for symbol_item in binance_symbols:
             symbol = symbol_item.get('symbol')
             print(f"Current Symbol: {symbol}")
@@ -76,26 +147,16 @@ def loop_get_binance_history(bin_api_key, bin_secret_key, start_date, end_date,
             retry_count = 0
             while retry_count < max_retries:
                 try:
-                    # Check if we need to reset the weight
-                    if time.time() >= weight_reset_time:
-                        weight_used = 0
-                        weight_reset_time = time.time() + 60
-
-                    # Check if we have enough weight
-                    if weight_used + 20 > weight_limit:
-                        sleep_time = weight_reset_time - time.time()
-                        print(f"Weight limit approaching. Sleeping for {sleep_time:.2f} seconds.")
-                        time.sleep(max(sleep_time, 0))
-                        weight_used = 0
-                        weight_reset_time = time.time() + 60
-
+                    # Request weight is handled by the shared rate limiter
                     raw_history = get_binance_trade_history(bin_api_key, bin_secret_key, unix_start, unix_end, symbol)
-                    trade_history_full.extend(raw_history)
-                    weight_used += 20
-                    break  # Success, move to next symbol
+                    if raw_history is None: # Error response, not worth retrying
+                        complete = False
+                    else:
+                        trade_history_in_range.extend(raw_history)
+                    break  # Move to next symbol
                 except WeightLimitExceeded as e:
-                    print(f"Weight limit exceeded: {e}. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
+                    # The limiter is paused for Retry-After, the next acquire waits it out
+                    print(f"Weight limit exceeded: {e}. Retrying...")
                     retry_count += 1
                 except requests.exceptions.RequestException as e:
                     print(f"Error occurred: {e}. Retrying in {retry_delay} seconds...")
@@ -104,14 +165,132 @@ def loop_get_binance_history(bin_api_key, bin_secret_key, start_date, end_date,
 
             if retry_count == max_retries:
                 print(f"Failed to fetch data for {symbol} after {max_retries} attempts. Skipping...")
+                complete = False
 
+        yield current_start_time, current_end_time, trade_history_in_range, complete
         current_start_time = current_end_time 
 
-    return trade_history_full
+# Symbol Discovery Section
+def get_bin_account_balances(bin_api_key, bin_secret_key):
+    base_url = 'https://api.binance.com'
+    acquire('binance', bin_api_key, weight=20)
+    timestamp = int(time.time() * 1000)
+    params = f'timestamp={timestamp}&omitZeroBalances=true'
+    signature = hmac.new(bin_secret_key.encode('utf-8'), params.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    headers = {
+        'X-MBX-APIKEY': bin_api_key
+    }
+
+    url = f"{base_url}/api/v3/account?{params}&signature={signature}"
+
+    response = http_client.get('binance', url, headers=headers, api_key=bin_api_key)
+
+    if response.status_code == 200:
+        data = response.json()
+        return data.get('balances', [])
+    else:
+        print(f"Error: Received status code {response.status_code} while fetching Binance balances")
+        print(response.text)
+        return []
+
+def probe_traded_symbols(bin_api_key, bin_secret_key, binance_symbols, max_retries=5):
+    """
+        Symbols with at least one trade on the account, one myTrades request per symbol.
+        Only used when discovery has nothing to go on, a symbol whose request fails is kept.
+
+        :return: (traded symbols, complete), complete is False if any symbol could not be probed
+    """
+    print(f"Binance: probing {len(binance_symbols)} symbols for trades")
+    traded = []
+    failed = 0
+
+    for symbol_item in binance_symbols:
+        page = None
+        for _ in range(max_retries):
+            try:
+                page = get_binance_trades_from_id(bin_api_key, bin_secret_key, symbol_item.get('symbol'), 0)
+                break
+            except WeightLimitExceeded as e:
+                # The limiter is paused for Retry-After, the next acquire waits it out
+                print(f"Weight limit exceeded: {e}. Retrying...")
+            except requests.exceptions.RequestException as e:
+                print(f"Error probing {symbol_item.get('symbol')}: {e}. Retrying...")
+
+        if page is None:
+            failed += 1
+        if page is None or page:
+            traded.append(symbol_item)
+
+    return traded, not failed
+
+# SyncState stream set once every symbol was probed for an owner, later syncs trust the candidates
+PROBED_STREAM = 'symbols_probed'
+
+def probe_batch(owner):
+    # An empty batch whose on_saved records the probe, so the mark is written by the ingestion writer
+    df = pd.DataFrame()
+    df.attrs['complete'] = True
+    return df, lambda: set_sync_state(owner, 'binance', PROBED_STREAM, last_time_in=int(time.time() * 1000))
+
+def discover_binance_symbols(bin_api_key, bin_secret_key, owner, start_date, end_date):
+    """
+        Build the list of symbols worth querying for an owner instead of every TRADING pair.
+
+        Candidate assets come from:
+            1. Current account balances
+            2. Coins deposited / withdrawn within the date range
+            3. Positions already stored in the database for this owner
+        Only pairs whose base asset is a candidate (and quote is one of the tracked quotes) are returned.
+
+        An asset bought and sold within the range leaves none of these behind, so on a first sync
+        (no Binance trades stored, never probed) every symbol is probed once instead.
+
+        :return: (symbols, probed), probed is True when a full probe succeeded and should be recorded
+                 with probe_batch once the trades it found are saved
+    """
+    binance_symbols = get_binance_symbols()
+    symbol_names = {item.get('symbol') for item in binance_symbols}
+
+    candidate_assets = set()
+    stored_symbols = set()
+
+    # Stored positions are either full symbols (trades) or coins (deposits / withdrawals)
+    for position in get_positions(owner, 'binance'):
+        if position in symbol_names:
+            stored_symbols.add(position)
+        candidate_assets.add(position)
+
+    # Manual imports, deposits and holdings store coins, not symbols, so the probe mark is kept separately
+    if not stored_symbols and get_sync_state(owner, 'binance', PROBED_STREAM) is None:
+        print(f"Binance: no trades stored for owner {owner}, probing every symbol")
+        return probe_traded_symbols(bin_api_key, bin_secret_key, binance_symbols)
+
+    for balance in get_bin_account_balances(bin_api_key, bin_secret_key):
+        if float(balance.get('free', 0)) + float(balance.get('locked', 0)) > 0:
+            candidate_assets.add(balance.get('asset'))
+
+    # Shared with the deposit / withdrawal jobs of the same range
+    try:
+        for history_type in ('deposits', 'withdrawals'):
+            for record in get_bin_transfers(history_type, bin_api_key, bin_secret_key, start_date, end_date):
+                candidate_assets.add(record.get('coin'))
+    except RuntimeError as e:
+        print(f"Binance: {e}, probing every symbol instead")
+        return probe_traded_symbols(bin_api_key, bin_secret_key, binance_symbols)[0], False
+
+    discovered = [
+        item for item in binance_symbols
+        if item.get('base_asset') in candidate_assets or item.get('symbol') in stored_symbols
+    ]
+
+    print(f"Binance: {len(discovered)} of {len(binance_symbols)} symbols selected for owner {owner}")
+    return discovered, False
 
 def parse_binance_hist(binance_trade_history, owner, all_unique):
     
     binance_orders = []
+    known = 0
 
     for trade in binance_trade_history:
         
@@ -134,6 +313,11 @@ def parse_binance_hist(binance_trade_history, owner, all_unique):
         uuid_components = [trade_id, date, symbol, price, quantity, action, owner, 'binance']
         custom_uuid = generate_custom_uuid(all_unique, *uuid_components)
 
+        # Already in the ledger
+        if is_known(custom_uuid):
+            known += 1
+            continue
+
         order = {
             'date': date,
             'exchange_id': custom_uuid,
@@ -149,21 +333,118 @@ def parse_binance_hist(binance_trade_history, owner, all_unique):
         binance_orders.append(order)
     
     df_binance_orders = pd.DataFrame(binance_orders)
+    df_binance_orders.attrs['known'] = known # Dropped as already saved, counted in the job progress
     return df_binance_orders
 
-def get_bin_history(bin_api_key, bin_secret_key, owner, start_date, end_date, all_unique):
+def iter_history_checkpointed(owner_data, start_date, end_date, all_unique):
+    """Trade history one saved window at a time, resuming from the last checkpoint (see backfill.py)."""
+    bin_api_key = owner_data['bin_api_key']
+    bin_secret_key = owner_data['bin_secret_key']
+    owner = owner_data['pic']
 
-    binance_symbols = get_binance_symbols()
-    raw_result = loop_get_binance_history(bin_api_key, bin_secret_key, start_date, end_date, binance_symbols)
-    df_parsed_hist = parse_binance_hist(raw_result, owner, all_unique)
+    binance_symbols, probed = discover_binance_symbols(bin_api_key, bin_secret_key, owner, start_date, end_date)
+    complete = True
+
+    for df, on_saved in iter_checkpointed(
+        owner_data, 'binance', 'trades', start_date, end_date,
+        lambda start, end: iter_binance_history(bin_api_key, bin_secret_key, start, end, binance_symbols),
+        lambda records: parse_binance_hist(records, owner, all_unique),
+    ):
+        complete = complete and df.attrs.get('complete', False)
+        yield df, on_saved
+
+    # A symbol the probe found but whose trades were not all fetched must be probed again
+    if probed and complete:
+        yield probe_batch(owner)
+
+
+def iter_bin_trades_incremental(owner_data, start_date, end_date, all_unique):
+    """
+        Fetch only new trades per symbol using the stored fromId watermark.
+
+        Yields (df, on_saved) per symbol. on_saved moves the watermark forward and must only
+        be called once df is in the database, so an interrupted run never skips trades.
+    """
+    bin_api_key = owner_data['bin_api_key']
+    bin_secret_key = owner_data['bin_secret_key']
+    owner = owner_data['pic']
+
+    binance_symbols, probed = discover_binance_symbols(bin_api_key, bin_secret_key, owner, start_date, end_date)
+    failed = 0
+
+    for symbol_item in binance_symbols:
+        symbol = symbol_item.get('symbol')
+        stream = f"trades:{symbol}"
+
+        state = get_sync_state(owner, 'binance', stream)
+        from_id = state.last_id + 1 if state and state.last_id is not None else 0
+
+        raw_history, complete = loop_get_binance_trades_from_id(bin_api_key, bin_secret_key, symbol, from_id)
+        if not complete:
+            failed += 1
+        if not raw_history:
+            continue
+
+        print(f"Binance: {len(raw_history)} new trades for {symbol} from id {from_id}")
+        df = parse_binance_hist(raw_history, owner, all_unique)
+        df.attrs['complete'] = complete
+
+        # Trades come back in id order, a partial fetch still only moves the watermark over what we have
+        last_id = max(trade.get('id') for trade in raw_history)
+        yield df, lambda stream=stream, last_id=last_id: set_sync_state(owner, 'binance', stream, last_id_in=last_id)
+
+    # A symbol the probe found but whose trades were not all fetched must be probed again
+    if probed and not failed:
+        yield probe_batch(owner)
+
+    if failed:
+        raise RuntimeError(f"{failed} Binance symbols could not be fetched completely, the next run resumes from their watermark")
+
+
+# Deposit / Withdrawal Ids
+def binance_transfer_uuid(trade, date, price, action, owner, all_unique):
+    """exchange_id of a deposit or withdrawal, None while its price is unknown (it is part of the id)."""
+    if price is None:
+        return None
+
+    uuid_components = [trade.get('txId'), date, trade.get('coin'), action, owner, 'binance', float(price), float(trade.get('amount'))]
+    return generate_custom_uuid(all_unique, *uuid_components)
+
+
+# Transfers fetched once per (key, range), discovery and the deposit / withdrawal jobs run concurrently
+TRANSFER_CACHE_SECONDS = 600
+_transfer_cache = {} # (history type, api key, start, end) -> (fetched at, records)
+_transfer_locks = {}
+_transfer_lock = threading.Lock()
 
-    return df_parsed_hist      
+def get_bin_transfers(history_type, bin_api_key, bin_secret_key, start_date, end_date):
+    """Deposit or withdrawal records, the second caller for the same range waits for the first fetch."""
+    key = (history_type, bin_api_key, start_date, end_date)
+
+    with _transfer_lock:
+        now = time.monotonic()
+        for expired in [k for k, (fetched_at, _) in _transfer_cache.items() if now - fetched_at > TRANSFER_CACHE_SECONDS]:
+            del _transfer_cache[expired]
+            _transfer_locks.pop(expired, None)
+        lock = _transfer_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        cached = _transfer_cache.get(key)
+        if cached is not None:
+            return cached[1]
+
+        # A failed fetch raises and is not cached, the next caller tries again
+        loop = loop_get_bin_deposit if history_type == 'deposits' else loop_get_bin_withdraw
+        records = loop(bin_api_key, bin_secret_key, start_date, end_date)
+        _transfer_cache[key] = (time.monotonic(), records)
+        return records
 
 
 # Deposit History Section
 def get_bin_deposit(bin_api_key, bin_secret_key, start_time, end_time):
 
     base_url = 'https://api.binance.com'
+    acquire('binance', bin_api_key, weight=1)
     timestamp = int(time.time() * 1000)
     params = f'timestamp={timestamp}&startTime={start_time}&endTime={end_time}'
     signature = hmac.new(bin_secret_key.encode('utf-8'), params.encode('utf-8'), hashlib.sha256).hexdigest()
@@ -174,7 +455,7 @@ def get_bin_deposit(bin_api_key, bin_secret_key, start_time, end_time):
 
     url = f"{base_url}/sapi/v1/capital/deposit/hisrec?{params}&signature={signature}"
 
-    response = requests.get(url, headers=headers)
+    response = http_client.get('binance', url, headers=headers, api_key=bin_api_key)
 
     if response.status_code == 200:
         data = response.json()
@@ -199,6 +480,10 @@ def loop_get_bin_deposit(bin_api_key, bin_secret_key, start_date, end_date):
         #print(f"Starting at {unix_start}, ending at {unix_end}") # Debug
 
         raw_record = get_bin_deposit(bin_api_key, bin_secret_key, unix_start, unix_end)
+
+        # Error response, fail the job rather than skip the window
+        if raw_record is None:
+            raise RuntimeError(f"Binance Deposit: window {current_start_time} to {current_end_time} could not be fetched")
         
         # Save info and update time
         record_history_full.extend(raw_record)
@@ -207,19 +492,29 @@ def loop_get_bin_deposit(bin_api_key, bin_secret_key, start_date, end_date):
     return record_history_full
 
 def parse_bin_deposits(bin_api_key, bin_secret_key, owner, start_date, end_date, all_unique):
-    bin_raw_deposits = loop_get_bin_deposit(bin_api_key, bin_secret_key, start_date, end_date)
+    bin_raw_deposits = get_bin_transfers('deposits', bin_api_key, bin_secret_key, start_date, end_date)
     binance_orders = []
 
-    for trade in bin_raw_deposits:
-        
-        # Filter only completed transactions
-        status = trade.get('status')
-        if status != 1: 
-            continue
+    # Filter only completed transactions
+    completed = [trade for trade in bin_raw_deposits if trade.get('status') == 1]
+
+    # Deposits already in the ledger are dropped before pricing, their ids are rebuilt from the cached prices
+    cached = peek_hist_prices('binance', [(trade.get('coin'), trade.get('insertTime')) for trade in completed])
+    completed, known = drop_known(completed, lambda trade: binance_transfer_uuid(trade, convert_timestamp_to_date(trade.get('insertTime')), cached[(trade.get('coin'), trade.get('insertTime'))], "Deposit", owner, all_unique))
+
+    # Price every new deposit in one batch
+    prices = get_bin_hist_prices([(trade.get('coin'), trade.get('insertTime')) for trade in completed])
+    unpriced = 0
+
+    for trade in completed:
 
         symbol = trade.get('coin') 
         timestamp = trade.get('insertTime')
-        price = float(get_bin_hist_price(symbol, ))
+        # No price yet, left for the next run rather than saved under a 0 price id
+        if prices[(symbol, timestamp)] is None:
+            unpriced += 1
+            continue
+        price = float(prices[(symbol, timestamp)])
         amount = float(trade.get('amount'))
 
         usd_value = price * amount
@@ -228,8 +523,7 @@ def parse_bin_deposits(bin_api_key, bin_secret_key, owner, start_date, end_date,
         trade_id = trade.get('txId')
 
         # Generate custom UUID
-        uuid_components = [trade_id, date, symbol, "Deposit", owner, 'binance', price, amount]
-        custom_uuid = generate_custom_uuid(all_unique, *uuid_components)
+        custom_uuid = binance_transfer_uuid(trade, date, price, "Deposit", owner, all_unique)
 
         order = {
             
@@ -247,6 +541,11 @@ def parse_bin_deposits(bin_api_key, bin_secret_key, owner, start_date, end_date,
         binance_orders.append(order)
     
     df_bybit_orders = pd.DataFrame(binance_orders)
+    df_bybit_orders.attrs['known'] = known
+    # The loop raises on any window it could not fetch, unpriced rows are fetched again by the next run
+    df_bybit_orders.attrs['complete'] = not unpriced
+    if unpriced:
+        print(f"{unpriced} rows left unpriced for {owner}, the next run tries them again")
     return df_bybit_orders
 
 
@@ -254,6 +553,7 @@ def parse_bin_deposits(bin_api_key, bin_secret_key, owner, start_date, end_date,
 def get_bin_withdraw(bin_api_key, bin_secret_key, start_time, end_time):
 
     base_url = 'https://api.binance.com'
+    acquire('binance', bin_api_key, weight=1)
     timestamp = int(time.time() * 1000)
     params = f'timestamp={timestamp}&startTime={start_time}&endTime={end_time}'
     signature = hmac.new(bin_secret_key.encode('utf-8'), params.encode('utf-8'), hashlib.sha256).hexdigest()
@@ -264,7 +564,7 @@ def get_bin_withdraw(bin_api_key, bin_secret_key, start_time, end_time):
 
     url = f"{base_url}/sapi/v1/capital/withdraw/history?{params}&signature={signature}"
 
-    response = requests.get(url, headers=headers)
+    response = http_client.get('binance', url, headers=headers, api_key=bin_api_key)
 
     if response.status_code == 200:
         data = response.json()
@@ -289,6 +589,10 @@ def loop_get_bin_withdraw(bin_api_key, bin_secret_key, start_date, end_date):
         #print(f"Starting at {unix_start}, ending at {unix_end}") # Debug
 
         raw_record = get_bin_withdraw(bin_api_key, bin_secret_key, unix_start, unix_end)
+
+        # Error response, fail the job rather than skip the window
+        if raw_record is None:
+            raise RuntimeError(f"Binance Withdrawal: window {current_start_time} to {current_end_time} could not be fetched")
         
         # Save info and update time
         record_history_full.extend(raw_record)
@@ -297,19 +601,29 @@ def loop_get_bin_withdraw(bin_api_key, bin_secret_key, start_date, end_date):
     return record_history_full
 
 def parse_bin_withdrawals(bin_api_key, bin_secret_key, owner, start_date, end_date, all_unique):
-    bin_raw_withdrawals = loop_get_bin_withdraw(bin_api_key, bin_secret_key, start_date, end_date)
+    bin_raw_withdrawals = get_bin_transfers('withdrawals', bin_api_key, bin_secret_key, start_date, end_date)
     binance_orders = []
 
-    for trade in bin_raw_withdrawals:
-        
-        # Filter only completed transactions
-        status = trade.get('status')
-        if status != 6:
-            continue
+    # Filter only completed transactions
+    completed = [trade for trade in bin_raw_withdrawals if trade.get('status') == 6]
+
+    # Withdrawals already in the ledger are dropped before pricing, their ids are rebuilt from the cached prices
+    cached = peek_hist_prices('binance', [(trade.get('coin'), convert_to_unix_v2(trade.get('completeTime'))) for trade in completed])
+    completed, known = drop_known(completed, lambda trade: binance_transfer_uuid(trade, extract_date(trade.get('completeTime')), cached[(trade.get('coin'), convert_to_unix_v2(trade.get('completeTime')))], "Withdraw", owner, all_unique))
+
+    # Price every new withdrawal in one batch, completeTime is "YYYY-MM-DD HH:MM:SS"
+    prices = get_bin_hist_prices([(trade.get('coin'), convert_to_unix_v2(trade.get('completeTime'))) for trade in completed])
+    unpriced = 0
+
+    for trade in completed:
 
         symbol = trade.get('coin') 
         timestamp = trade.get('completeTime')
-        price = float(get_bin_hist_price(symbol, timestamp))
+        # No price yet, left for the next run rather than saved under a 0 price id
+        if prices[(symbol, convert_to_unix_v2(timestamp))] is None:
+            unpriced += 1
+            continue
+        price = float(prices[(symbol, convert_to_unix_v2(timestamp))])
         amount = float(trade.get('amount'))
 
         usd_value = price * amount
@@ -318,8 +632,7 @@ def parse_bin_withdrawals(bin_api_key, bin_secret_key, owner, start_date, end_da
         trade_id = trade.get('txId')
 
         # Generate custom UUID
-        uuid_components = [trade_id, date, symbol, "Withdraw", owner, 'binance', price, amount]
-        custom_uuid = generate_custom_uuid(all_unique, *uuid_components)
+        custom_uuid = binance_transfer_uuid(trade, date, price, "Withdraw", owner, all_unique)
 
         order = {
             'date': date,
@@ -336,15 +649,18 @@ def parse_bin_withdrawals(bin_api_key, bin_secret_key, owner, start_date, end_da
         binance_orders.append(order)
     
     df_bybit_orders = pd.DataFrame(binance_orders)
+    df_bybit_orders.attrs['known'] = known
+    # The loop raises on any window it could not fetch, unpriced rows are fetched again by the next run
+    df_bybit_orders.attrs['complete'] = not unpriced
+    if unpriced:
+        print(f"{unpriced} rows left unpriced for {owner}, the next run tries them again")
     return df_bybit_orders
 
 
 # Database Section
 def fetch_history(owner_data, history_type, start_date, end_date, all_unique):
-    """Fetch history data based on the type."""
-    if history_type == 'trades':
-        return get_bin_history(owner_data['bin_api_key'], owner_data['bin_secret_key'], owner_data['pic'], start_date, end_date, all_unique)
-    elif history_type == 'deposits':
+    """Fetch deposit or withdrawal history, trades are saved window by window (see iter_history_checkpointed)."""
+    if history_type == 'deposits':
         return parse_bin_deposits(owner_data['bin_api_key'], owner_data['bin_secret_key'], owner_data['pic'], start_date, end_date, all_unique)
     elif history_type == 'withdrawals':
         return parse_bin_withdrawals(owner_data['bin_api_key'], owner_data['bin_secret_key'], owner_data['pic'], start_date, end_date, all_unique)
@@ -352,44 +668,22 @@ def fetch_history(owner_data, history_type, start_date, end_date, all_unique):
         raise ValueError(f"Invalid history type: {history_type}")
 
 def save_to_database(df):
-    """Save the DataFrame to the database based on the history type."""
+    """Save the DataFrame to the database in one bulk transaction."""
     json_hist = df.to_dict(orient='records')
 
-    for hist in json_hist:
-
-        add_txn(
-            exchange_id_in=hist.get('exchange_id'),
-            txn_date_in=hist.get('date'),
-            position_in=hist.get('position'),
-            txn_type_in=hist.get('action'),
-            pic_in=hist.get('PIC'),
-            exchange_in=hist.get('exchange'),
-            token_amt_in=hist.get('exec_qty'),
-            price_in=hist.get('exec_price'),
-            usd_amt_in=hist.get('usd_value')
-        )
-
-# Master
-def save_binance_records(acc_owners, mode, all_unique):
-    """
-        Save trading history for a given owner within a specified date range.
-
-        :param acc_owners: a list of owners as seen in the .env file
-        :param mode: Either "Weekly" or "Full"
-    """
-
-    start_date, end_date = assign_time(mode) # "Weekly" / "Full"
-
-    for owner in acc_owners:
-
-        owner_data = process_owners(owner)
-        # Check if Bybit API key or secret key is "none"
-        if owner_data['bin_api_key'] == 'none' or owner_data['bin_secret_key'] == 'none':
-            print(f"Skipping owner {owner_data['pic']} due to missing Binance API credentials")
-            continue
-
-        history_types = ['trades', 'deposits', 'withdrawals']
+    rows = [
+        {
+            'exchange_id': hist.get('exchange_id'),
+            'txn_date': hist.get('date'),
+            'position': hist.get('position'),
+            'txn_type': hist.get('action'),
+            'pic': hist.get('PIC'),
+            'exchange': hist.get('exchange'),
+            'token_amt': hist.get('exec_qty'),
+            'token_price': hist.get('exec_price'),
+            'usd_value': hist.get('usd_value')
+        }
+        for hist in json_hist
+    ]
 
-        for history_type in history_types:
-            df = fetch_history(owner_data, history_type, start_date, end_date, all_unique = True)
-            save_to_database(df)
+    return add_txns_bulk(rows)
@@ -1,17 +1,22 @@
 # Base Imports
 import hashlib
 import hmac
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 import urllib.parse
 import json
 from requests.exceptions import ConnectTimeout, RequestException
 
 # External Imports
-from exchanges_func.utils import convert_timestamp_to_date, generate_custom_uuid, convert_to_unix, assign_time, process_owners, get_bybit_hist_price
-from db_func.funcs import add_txn
+from exchanges_func.utils import convert_timestamp_to_date, generate_custom_uuid, convert_to_unix, get_bybit_hist_prices, peek_hist_prices
+from exchanges_func.rate_limiter import acquire
+from exchanges_func import http_client
+from exchanges_func.backfill import iter_checkpointed
+from db_func.funcs import add_txns_bulk
+from db_func.dedup_index import is_known, drop_known
 import pandas as pd
-import requests
 
 """
     Collects data from Exchange API and saves it into the database
@@ -21,6 +26,109 @@ import requests
         3. Withdrawal History 
 """
 
+# Adaptive Windows Section
+# Longest range each endpoint accepts per request
+MAX_WINDOW = {
+    'trades': timedelta(days=7), # /v5/execution/list
+    'deposits': timedelta(days=30), # /v5/asset/deposit/query-record
+    'withdrawals': timedelta(days=30), # /v5/asset/withdraw/query-record
+}
+MIN_WINDOW = timedelta(hours=1)
+DEEP_PAGES = 3 # a window needing more pages than this is halved
+
+def next_window_size(window, pages, max_window):
+    # One page means the window was sparse, try a longer one. Deep pagination means it was dense.
+    if pages <= 1:
+        return min(window * 2, max_window)
+    if pages > DEEP_PAGES:
+        return max(window / 2, MIN_WINDOW)
+    return window
+
+# Parallel fan-out for long ranges: fixed windows fetched at once, sharing the key's rate limit
+FANOUT_WORKERS = int(os.getenv('BYBIT_FANOUT_WORKERS', 4)) # 1 turns fan-out off
+FANOUT_WINDOW = timedelta(hours=int(os.getenv('BYBIT_FANOUT_WINDOW_HOURS', 7 * 24)))
+
+def fetch_window(fetch_page, unix_start, unix_end, rows_key):
+    """Follow the cursor chain of one window, returns (records, complete, pages)."""
+    cursor = ""
+    records_in_range = []
+    pages = 0
+
+    while True:
+        raw_page = fetch_page(unix_start, unix_end, cursor)
+        pages += 1
+
+        # Bybit also reports errors (ie: 10006 rate limit) in a 200 response with a non zero retCode
+        body = raw_page.get('body') if raw_page else None
+        if not raw_page or raw_page.get('statusCode') != 200 or not isinstance(body, dict) or body.get('retCode') != 0:
+            print(f"Error fetching data: {body if raw_page else 'no response'}")
+            return records_in_range, False, pages
+
+        result = body.get('result') or {}
+        records_in_range.extend(result.get(rows_key) or [])
+        cursor = result.get('nextPageCursor')
+
+        if not cursor:
+            return records_in_range, True, pages
+
+def iter_adaptive_windows(fetch_page, start_date, end_date, initial_window, max_window, rows_key):
+    """
+        Walk the range with windows that grow while pages come back sparse and shrink when
+        the cursor chain gets deep, always within the endpoint's maximum span.
+
+        :param fetch_page: function(unix_start, unix_end, cursor) -> {"statusCode", "body"}
+        :param rows_key: Key holding the records in body.result, ie: "list" or "rows"
+        :return: yields (window_start, window_end, records, complete), complete is False if a page failed
+    """
+    current_start_time = start_date
+    window = min(initial_window, max_window)
+
+    while current_start_time < end_date:
+        current_end_time = min(current_start_time + window, end_date)
+
+        records_in_range, complete, pages = fetch_window(fetch_page, convert_to_unix(current_start_time), convert_to_unix(current_end_time), rows_key)
+
+        print(f"Bybit: {current_start_time} to {current_end_time}, {len(records_in_range)} records in {pages} pages")
+        yield current_start_time, current_end_time, records_in_range, complete
+
+        current_start_time = current_end_time
+        window = next_window_size(window, pages, max_window)
+
+def iter_fanout_windows(fetch_page, start_date, end_date, window, rows_key, id_key, max_workers=FANOUT_WORKERS):
+    """
+        Split the range into fixed windows and fetch them concurrently on a bounded pool.
+        Windows are still yielded in order (so checkpoints stay contiguous), records seen in
+        an earlier window (a trade on the boundary) are dropped by id_key.
+
+        :return: yields (window_start, window_end, records, complete)
+    """
+    windows = []
+    current_start_time = start_date
+    while current_start_time < end_date:
+        current_end_time = min(current_start_time + window, end_date)
+        windows.append((current_start_time, current_end_time))
+        current_start_time = current_end_time
+
+    print(f"Bybit: fetching {len(windows)} windows on {max_workers} workers")
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        results = pool.map(
+            lambda bounds: fetch_window(fetch_page, convert_to_unix(bounds[0]), convert_to_unix(bounds[1]), rows_key),
+            windows,
+        )
+
+        seen_ids = set()
+        for (window_start, window_end), (records_in_range, complete, pages) in zip(windows, results):
+            unique_records = [record for record in records_in_range if record.get(id_key) not in seen_ids]
+            seen_ids.update(record.get(id_key) for record in unique_records)
+
+            yield window_start, window_end, unique_records, complete
+    finally:
+        # If the consumer stops early, drop the windows that have not started
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
 # Trade History Section 
 def get_bybit_trade_history(bb_api_key, bb_secret_key, category, start_time, end_time, cursor, max_retries=3, delay=5):
     url = "https://api.bybit.com/v5/execution/list"
@@ -35,6 +143,7 @@ def get_bybit_trade_history(bb_api_key, bb_secret_key, category, start_time, end
     
     for attempt in range(max_retries):
         try:
+            acquire('bybit', bb_api_key)
             timestamp = str(int(time.time() * 1000))
             queryString = f"category={category}&startTime={start_time}&endTime={end_time}&cursor={parse_cursor}"
             param_str = f'{timestamp}{bb_api_key}{queryString}'
@@ -47,7 +156,7 @@ def get_bybit_trade_history(bb_api_key, bb_secret_key, category, start_time, end
                 'X-BAPI-TIMESTAMP': timestamp,
             }
             
-            response = requests.get(url, headers=headers, params=parameters, timeout=10)
+            response = http_client.get('bybit', url, params=parameters, headers=headers, api_key=bb_api_key)
             
             if response.status_code == 200:
                 return {
@@ -55,8 +164,8 @@ def get_bybit_trade_history(bb_api_key, bb_secret_key, category, start_time, end
                     "body": response.json()
                 }
             elif response.status_code == 429:  # Rate limit exceeded
-                print(f"Rate limit exceeded. Retrying in {delay} seconds...")
-                time.sleep(delay)
+                # The limiter is paused until X-Bapi-Limit-Reset-Timestamp, the next acquire waits it out
+                print("Rate limit exceeded. Retrying...")
             else:
                 print(f"Request failed with status code {response.status_code}. Retrying...")
                 time.sleep(delay)
@@ -80,49 +189,28 @@ def get_bybit_trade_history(bb_api_key, bb_secret_key, category, start_time, end
         })
     }
 
-def loop_get_bybit_history(bb_api_key, bb_secret_key, category, start_date, end_date):
+def iter_bybit_history(bb_api_key, bb_secret_key, category, start_date, end_date):
+    """
+        Walk the range with adaptive windows (1 day to start, up to 7), following the cursor within each one.
+        Ranges longer than 7 days are fetched as parallel windows instead (see iter_fanout_windows).
+        Yields (window_start, window_end, trades, complete), complete is False if a page failed.
+    """
     unix_start = convert_to_unix(start_date)
     unix_end = convert_to_unix(end_date)
     print(f"Bybit: Full unix range {unix_start}, {unix_end}")
 
-    current_start_time = start_date
-    trade_history_full = []
-
-    while current_start_time < end_date:
-        current_end_time = min(current_start_time + timedelta(days=1), end_date)
-
-        unix_start = convert_to_unix(current_start_time)
-        unix_end = convert_to_unix(current_end_time)
+    fetch_page = lambda unix_start, unix_end, cursor: get_bybit_trade_history(bb_api_key, bb_secret_key, category, unix_start, unix_end, cursor)
 
-        print(f"Starting at {unix_start}, ending at {unix_end}") 
+    # Long backfills are latency bound, fan the windows out. Short (incremental) ranges stay adaptive.
+    if FANOUT_WORKERS > 1 and end_date - start_date > MAX_WINDOW['trades']:
+        return iter_fanout_windows(fetch_page, start_date, end_date, min(FANOUT_WINDOW, MAX_WINDOW['trades']), 'list', 'execId')
 
-        cursor = ""
-        trade_history_in_range = []
-
-        while True:
-            raw_history = get_bybit_trade_history(bb_api_key, bb_secret_key, category, unix_start, unix_end, cursor)
-
-            if raw_history['statusCode'] != 200:
-                print(f"Error fetching data: {raw_history['body']}")
-                break
-
-            result = raw_history.get('body', {}).get('result', {})
-            cursor = result.get('nextPageCursor')
-
-            history_list = result.get('list', [])
-            trade_history_in_range.extend(history_list)
-
-            if not cursor:
-                break
-
-        trade_history_full.extend(trade_history_in_range)
-        current_start_time = current_end_time 
-
-    return trade_history_full
+    return iter_adaptive_windows(fetch_page, start_date, end_date, timedelta(days=1), MAX_WINDOW['trades'], 'list')
 
 def parse_bybit_hist(bybit_trade_history, owner, all_unique):
 
     bybit_orders = []
+    known = 0
 
     for trade in bybit_trade_history:
         
@@ -139,6 +227,11 @@ def parse_bybit_hist(bybit_trade_history, owner, all_unique):
         uuid_components = [trade_id, date, symbol, execValue, execQty, action, owner, 'bybit']
         custom_uuid = generate_custom_uuid(all_unique, *uuid_components)
 
+        # Already in the ledger
+        if is_known(custom_uuid):
+            known += 1
+            continue
+
         order = {
             'date': convert_timestamp_to_date(date),
             'exchange_id': custom_uuid,
@@ -154,13 +247,29 @@ def parse_bybit_hist(bybit_trade_history, owner, all_unique):
         bybit_orders.append(order)
     
     df_bybit_orders = pd.DataFrame(bybit_orders)
+    df_bybit_orders.attrs['known'] = known # Dropped as already saved, counted in the job progress
     return df_bybit_orders
 
-def get_bybit_history(bb_api_key, bb_secret_key, owner, start_date, end_date, all_unique):
-    raw_result = loop_get_bybit_history(bb_api_key, bb_secret_key, 'spot', start_date, end_date)
-    df_parsed_hist = parse_bybit_hist(raw_result, owner, all_unique)
+def iter_history_checkpointed(owner_data, start_date, end_date, all_unique):
+    """Trade history one saved window at a time, resuming from the last checkpoint (see backfill.py)."""
+    bb_api_key = owner_data['bybit_api_key']
+    bb_secret_key = owner_data['bybit_secret_key']
+
+    return iter_checkpointed(
+        owner_data, 'bybit', 'trades', start_date, end_date,
+        lambda start, end: iter_bybit_history(bb_api_key, bb_secret_key, 'spot', start, end),
+        lambda records: parse_bybit_hist(records, owner_data['pic'], all_unique),
+    )
 
-    return df_parsed_hist
+
+# Deposit / Withdrawal Ids
+def bybit_transfer_uuid(trade, date_key, price, action, owner, all_unique):
+    """exchange_id of a deposit or withdrawal, None while its price is unknown (it is part of the id)."""
+    if price is None:
+        return None
+
+    uuid_components = [trade.get('txID'), trade.get(date_key), trade.get('coin'), float(price), float(trade.get('amount')), action, owner, 'bybit']
+    return generate_custom_uuid(all_unique, *uuid_components)
 
 
 # Deposit History Section
@@ -176,6 +285,7 @@ def get_bybit_deposit(bb_api_key, bb_secret_key, start_time, end_time, cursor):
     }
     
     try:
+        acquire('bybit', bb_api_key)
         timestamp = str(int(time.time() * 1000))
         queryString = f"startTime={start_time}&endTime={end_time}&cursor={parse_cursor}"
         param_str = f'{timestamp}{bb_api_key}{queryString}'
@@ -188,7 +298,7 @@ def get_bybit_deposit(bb_api_key, bb_secret_key, start_time, end_time, cursor):
             'X-BAPI-TIMESTAMP': timestamp,
         }
         
-        response = requests.get(url, headers=headers, params=parameters)
+        response = http_client.get('bybit', url, params=parameters, headers=headers, api_key=bb_api_key)
         
         if response.status_code == 200:
             data = response.json()
@@ -211,37 +321,23 @@ def get_loop_bybit_deposit(bb_api_key, bb_secret_key, start_date, end_date, curs
     unix_end = convert_to_unix(end_date)
     print(f"Bybit Deposit: Full unix range {unix_start}, {unix_end}")
 
-    # Another Loop to collect more than 7 days data
-    current_start_time = start_date # Current start time for the loop
+    # Windows start at the 30 day maximum and only shrink when pagination gets deep
     record_history_full = []
-
-    while current_start_time < end_date:
-        current_end_time = min(current_start_time + timedelta(days=30), end_date)
-
-        unix_start = convert_to_unix(current_start_time)
-        unix_end = convert_to_unix(current_end_time)
-
-        #print(f"Starting at {unix_start}, ending at {unix_end}") # Debug
-
-        # Loop Cursor
-        cursor = ""
-        record_in_range = []
-
-        while True:
-            raw_record = get_bybit_deposit(bb_api_key, bb_secret_key, unix_start, unix_end, cursor)
-            # Parsing only to entries
-            result = raw_record.get('body').get('result')
-            cursor = result.get('nextPageCursor')
-
-            if not cursor:
-                break
-                
-            record_list = result.get('rows')
-            record_in_range.extend(record_list)
-        
-        # Save info and update time
+    windows = iter_adaptive_windows(
+        lambda unix_start, unix_end, cursor: get_bybit_deposit(bb_api_key, bb_secret_key, unix_start, unix_end, cursor),
+        start_date, end_date, MAX_WINDOW['deposits'], MAX_WINDOW['deposits'], 'rows',
+    )
+
+    failed = 0
+    for window_start, window_end, record_in_range, complete in windows:
+        if not complete:
+            failed += 1
+            print(f"Bybit Deposit: window {window_start} to {window_end} incomplete")
         record_history_full.extend(record_in_range)
-        current_start_time = current_end_time 
+
+    # Fail the job, a skipped window would never be fetched again once the high-water mark moves past it
+    if failed:
+        raise RuntimeError(f"{failed} Bybit deposit windows could not be fetched")
 
     return record_history_full
 
@@ -249,19 +345,30 @@ def parse_bybit_deposits(bb_api_key, bb_secret_key, start_date, end_date, owner,
     bybit_deposits = get_loop_bybit_deposit(bb_api_key, bb_secret_key, start_date, end_date, cursor)
     bybit_orders = []
 
+    # Deposits already in the ledger are dropped before pricing, their ids are rebuilt from the cached prices
+    cached = peek_hist_prices('bybit', [(trade.get('coin'), trade.get('successAt')) for trade in bybit_deposits])
+    bybit_deposits, known = drop_known(bybit_deposits, lambda trade: bybit_transfer_uuid(trade, 'successAt', cached[(trade.get('coin'), trade.get('successAt'))], "Deposit", owner, all_unique))
+
+    # Price every new deposit in one batch
+    prices = get_bybit_hist_prices([(trade.get('coin'), trade.get('successAt')) for trade in bybit_deposits])
+    unpriced = 0
+
     for trade in bybit_deposits:
         
         date = trade.get('successAt')
         symbol = trade.get('coin') 
-        price = float(get_bybit_hist_price(symbol,date))
+        # No price yet, left for the next run rather than saved under a 0 price id
+        if prices[(symbol, date)] is None:
+            unpriced += 1
+            continue
+        price = float(prices[(symbol, date)])
         amount = float(trade.get('amount'))
         trade_id = trade.get('txID')
 
         usd_value = price * amount
 
         # Generate custom UUID
-        uuid_components = [trade_id, date, symbol, price, amount, "Deposit", owner, 'bybit']
-        custom_uuid = generate_custom_uuid(all_unique, *uuid_components)
+        custom_uuid = bybit_transfer_uuid(trade, 'successAt', price, "Deposit", owner, all_unique)
 
         order = {
             'date': convert_timestamp_to_date(date),
@@ -278,6 +385,11 @@ def parse_bybit_deposits(bb_api_key, bb_secret_key, start_date, end_date, owner,
         bybit_orders.append(order)
     
     df_bybit_orders = pd.DataFrame(bybit_orders)
+    df_bybit_orders.attrs['known'] = known
+    # The loop raises on any window it could not fetch, unpriced rows are fetched again by the next run
+    df_bybit_orders.attrs['complete'] = not unpriced
+    if unpriced:
+        print(f"{unpriced} rows left unpriced for {owner}, the next run tries them again")
     return df_bybit_orders
 
 
@@ -295,6 +407,7 @@ def get_bybit_withdraw(bb_api_key, bb_secret_key, withdraw_type, start_time, end
     }
     
     try:
+        acquire('bybit', bb_api_key)
         timestamp = str(int(time.time() * 1000))
         queryString = f"withdrawType={withdrawType}&startTime={start_time}&endTime={end_time}&cursor={parse_cursor}"
         param_str = f'{timestamp}{bb_api_key}{queryString}'
@@ -307,7 +420,7 @@ def get_bybit_withdraw(bb_api_key, bb_secret_key, withdraw_type, start_time, end
             'X-BAPI-TIMESTAMP': timestamp,
         }
         
-        response = requests.get(url, headers=headers, params=parameters)
+        response = http_client.get('bybit', url, params=parameters, headers=headers, api_key=bb_api_key)
         
         if response.status_code == 200:
             data = response.json()
@@ -330,37 +443,23 @@ def get_loop_bybit_withdraw(bb_api_key, bb_secret_key, withdraw_type, start_date
     unix_end = convert_to_unix(end_date)
     print(f"Bybit Withdraw: Full unix range {unix_start}, {unix_end}")
 
-    # Another Loop to collect more than 7 days data
-    current_start_time = start_date # Current start time for the loop
+    # Windows start at the 30 day maximum and only shrink when pagination gets deep
     record_history_full = []
-
-    while current_start_time < end_date:
-        current_end_time = min(current_start_time + timedelta(days=30), end_date)
-
-        unix_start = convert_to_unix(current_start_time)
-        unix_end = convert_to_unix(current_end_time)
-
-        #print(f"Starting at {unix_start}, ending at {unix_end}") # Debug
-
-        # Loop Cursor
-        cursor = ""
-        record_in_range = []
-
-        while True:
-            raw_record = get_bybit_withdraw(bb_api_key, bb_secret_key, withdraw_type, unix_start, unix_end, cursor)
-            # Parsing only to entries
-            result = raw_record.get('body').get('result')
-            cursor = result.get('nextPageCursor')
-
-            if not cursor:
-                break
-                
-            record_list = result.get('rows')
-            record_in_range.extend(record_list)
-        
-        # Save info and update time
+    windows = iter_adaptive_windows(
+        lambda unix_start, unix_end, cursor: get_bybit_withdraw(bb_api_key, bb_secret_key, withdraw_type, unix_start, unix_end, cursor),
+        start_date, end_date, MAX_WINDOW['withdrawals'], MAX_WINDOW['withdrawals'], 'rows',
+    )
+
+    failed = 0
+    for window_start, window_end, record_in_range, complete in windows:
+        if not complete:
+            failed += 1
+            print(f"Bybit Withdraw: window {window_start} to {window_end} incomplete")
         record_history_full.extend(record_in_range)
-        current_start_time = current_end_time 
+
+    # Fail the job, a skipped window would never be fetched again once the high-water mark moves past it
+    if failed:
+        raise RuntimeError(f"{failed} Bybit withdrawal windows could not be fetched")
 
     return record_history_full
 
@@ -369,19 +468,30 @@ def parse_bybit_withdrawals(bb_api_key, bb_secret_key, start_date, end_date, own
     bybit_withdrawals= get_loop_bybit_withdraw(bb_api_key, bb_secret_key, withdraw_type, start_date, end_date, cursor)
     bybit_orders = []
 
+    # Withdrawals already in the ledger are dropped before pricing, their ids are rebuilt from the cached prices
+    cached = peek_hist_prices('bybit', [(trade.get('coin'), trade.get('createTime')) for trade in bybit_withdrawals])
+    bybit_withdrawals, known = drop_known(bybit_withdrawals, lambda trade: bybit_transfer_uuid(trade, 'createTime', cached[(trade.get('coin'), trade.get('createTime'))], "Withdraw", owner, all_unique))
+
+    # Price every new withdrawal in one batch
+    prices = get_bybit_hist_prices([(trade.get('coin'), trade.get('createTime')) for trade in bybit_withdrawals])
+    unpriced = 0
+
     for trade in bybit_withdrawals:
         
         date = trade.get('createTime')
         symbol = trade.get('coin') 
-        price = float(get_bybit_hist_price(symbol, date))
+        # No price yet, left for the next run rather than saved under a 0 price id
+        if prices[(symbol, date)] is None:
+            unpriced += 1
+            continue
+        price = float(prices[(symbol, date)])
         amount = float(trade.get('amount'))
         trade_id = trade.get('txID')
 
         usd_value = price * amount
 
         # Generate custom UUID
-        uuid_components = [trade_id, date, symbol, price, amount, "Withdraw", owner, 'bybit']
-        custom_uuid = generate_custom_uuid(all_unique, *uuid_components)
+        custom_uuid = bybit_transfer_uuid(trade, 'createTime', price, "Withdraw", owner, all_unique)
 
         order = {
             'date': convert_timestamp_to_date(date),
@@ -398,15 +508,18 @@ def parse_bybit_withdrawals(bb_api_key, bb_secret_key, start_date, end_date, own
         bybit_orders.append(order)
     
     df_bybit_orders = pd.DataFrame(bybit_orders)
+    df_bybit_orders.attrs['known'] = known
+    # The loop raises on any window it could not fetch, unpriced rows are fetched again by the next run
+    df_bybit_orders.attrs['complete'] = not unpriced
+    if unpriced:
+        print(f"{unpriced} rows left unpriced for {owner}, the next run tries them again")
     return df_bybit_orders
 
 
 # Database Section
 def fetch_history(owner_data, history_type, start_date, end_date, all_unique):
-    """Fetch history data based on the type."""
-    if history_type == 'trades':
-        return get_bybit_history(owner_data['bybit_api_key'], owner_data['bybit_secret_key'], owner_data['pic'], start_date, end_date, all_unique)
-    elif history_type == 'deposits':
+    """Fetch deposit or withdrawal history, trades are saved window by window (see iter_history_checkpointed)."""
+    if history_type == 'deposits':
         return parse_bybit_deposits(owner_data['bybit_api_key'], owner_data['bybit_secret_key'], start_date, end_date, owner_data['pic'], all_unique)
     elif history_type == 'withdrawals':
         return parse_bybit_withdrawals(owner_data['bybit_api_key'], owner_data['bybit_secret_key'], start_date, end_date, owner_data['pic'], all_unique)
@@ -414,47 +527,22 @@ def fetch_history(owner_data, history_type, start_date, end_date, all_unique):
         raise ValueError(f"Invalid history type: {history_type}")
 
 def save_to_database(df):
-    """Save the DataFrame to the database based on the history type."""
+    """Save the DataFrame to the database in one bulk transaction."""
     json_hist = df.to_dict(orient='records')
 
-    for hist in json_hist:
-
-        add_txn(
-            exchange_id_in=hist.get('exchange_id'),
-            txn_date_in=hist.get('date'),
-            position_in=hist.get('position'),
-            txn_type_in=hist.get('action'),
-            pic_in=hist.get('PIC'),
-            exchange_in=hist.get('exchange'),
-            token_amt_in=hist.get('exec_qty'),
-            price_in=hist.get('exec_price'),
-            usd_amt_in=hist.get('usd_value')
-        )
-
-
-# Master
-def save_bybit_records(acc_owners, mode, all_unique):
-    """
-        Save trading history for a given owner within a specified date range.
-
-        :param acc_owners: a list of owners as seen in the .env file
-        :param mode: Either "Weekly" or "Full"
-    """
-
-    start_date, end_date = assign_time(mode) # "Weekly" / "Full"
-    print(start_date)
-    print(end_date)
-
-    for owner in acc_owners:
-
-        owner_data = process_owners(owner)
-        # Check if Bybit API key or secret key is "none"
-        if owner_data['bybit_api_key'] == 'none' or owner_data['bybit_secret_key'] == 'none':
-            print(f"Skipping owner {owner_data['pic']} due to missing Bybit API credentials")
-            continue
-
-        history_types = ['trades', 'deposits', 'withdrawals']
+    rows = [
+        {
+            'exchange_id': hist.get('exchange_id'),
+            'txn_date': hist.get('date'),
+            'position': hist.get('position'),
+            'txn_type': hist.get('action'),
+            'pic': hist.get('PIC'),
+            'exchange': hist.get('exchange'),
+            'token_amt': hist.get('exec_qty'),
+            'token_price': hist.get('exec_price'),
+            'usd_value': hist.get('usd_value')
+        }
+        for hist in json_hist
+    ]
 
-        for history_type in history_types:
-            df = fetch_history(owner_data, history_type, start_date, end_date, all_unique)
-            save_to_database(df)
\ No newline at end of file
+    return add_txns_bulk(rows)
@@ -1,5 +1,6 @@
 import pandas as pd
 import json
+from functools import lru_cache
 from exchanges_func.utils import get_bin_price, get_bybit_price
 from datetime import datetime
 
@@ -10,6 +11,42 @@ def json_serial(obj):
         return obj.strftime('%Y-%m-%d')  # Format date as YYYY-MM-DD
     raise TypeError(f"Type {type(obj)} not serializable")
 
+QUOTE_CURRENCIES = ('BUSD','USDT','USDC', 'USD', 'BTC', 'ETH')
+STABLECOINS = frozenset(['USDT', 'USDC', 'BUSD', 'DAI', 'TUSD'])
+
+@lru_cache(maxsize=None)
+def extract_significant_token(position):
+    """
+    Transforms a position into only the significant token.
+    Ie: SOLUSDT -> SOL, stablecoins -> ''
+    Cached, there are only a few hundred distinct positions.
+    """
+    # Filter 1: If the position is already BTC or ETH, return it as is
+    if position in ('BTC', 'ETH'):
+        return position
+    
+    # Filter 2: Remove quote currencies from the end of the position string
+    for quote in QUOTE_CURRENCIES:
+        if position.endswith(quote):
+            position = position[:-len(quote)]
+            break
+    
+    # Filter 3: Remove stablecoins
+    if position in STABLECOINS:
+        return ''
+    
+    # If no quote currency is found, return the original position
+    return position
+
+def normalize_positions(positions):
+    """
+    Vectorized extract_significant_token over a Series of positions.
+    Each distinct position is normalized once and the result is mapped back onto every row.
+    """
+    unique_positions = positions.unique()
+    mapping = {position: extract_significant_token(position) for position in unique_positions}
+    return positions.map(mapping)
+
 def clean_transactions(data):
     """
     Transforms positions into only the significant token.
@@ -19,30 +56,8 @@ def clean_transactions(data):
     # Convert the list of dictionaries to a DataFrame
     df = pd.DataFrame(data)
     
-    # Function to extract the significant token
-    def extract_significant_token(position):
-        quote_currencies = ['BUSD','USDT','USDC', 'USD', 'BTC', 'ETH']
-        stablecoins = ['USDT', 'USDC', 'BUSD', 'DAI', 'TUSD']
-
-        # Filter 1: If the position is already BTC or ETH, return it as is
-        if position in ['BTC', 'ETH']:
-            return position
-        
-        # Filter 2: Remove quote currencies from the end of the position string
-        for quote in quote_currencies:
-            if position.endswith(quote):
-                position = position[:-len(quote)]
-                break
-        
-        # Filter 3: Remove stablecoins
-        if position in stablecoins:
-            return ''
-        
-        # If no quote currency is found, return the original position
-        return position
-    
-    # Apply the function to the 'position' column
-    df['position'] = df['position'].apply(extract_significant_token)
+    # Normalize each distinct position once, then map it onto the 'position' column
+    df['position'] = normalize_positions(df['position'])
 
     # Remove rows where 'position' is an empty string
     df = df[df['position'] != '']
@@ -52,120 +67,129 @@ def clean_transactions(data):
     
     return cleaned_data
 
-""" Calculations Section """
-def create_df_pnl(token_name):
-    df_pnl = pd.DataFrame(columns=['PnL Type', 'Position', 'Avg Buy (USD)', 'Sold Value (USD)', 'Sold Amount', 'Current Balance','USD Value','PnL'])
-    df_pnl.loc[0] = ['Realized', token_name, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
-    df_pnl.loc[1] = ['Unrealized', token_name, 0.0, 0.0, 0.0, 0.0, 0.0,0.0]
-
-    return df_pnl
-
-def update_df_pnl(df_pnl, avg_buy_price, value_sold, amount_sold, current_balance, current_price):
-    df_pnl.loc[df_pnl['PnL Type'] == 'Realized', 'Avg Buy (USD)'] = float(avg_buy_price)
-    df_pnl.loc[df_pnl['PnL Type'] == 'Unrealized', 'Avg Buy (USD)'] = float(avg_buy_price)
-
-    # Update Realized PNL
-    df_pnl.loc[df_pnl['PnL Type'] == 'Realized', 'Sold Value (USD)'] = float(value_sold)
-    df_pnl.loc[df_pnl['PnL Type'] == 'Realized', 'Sold Amount'] = float(amount_sold)
-    df_pnl.loc[df_pnl['PnL Type'] == 'Realized', 'PnL'] = float(value_sold - (amount_sold * avg_buy_price))
-
-    # Update Unrealized PNL
-    df_pnl.loc[df_pnl['PnL Type'] == 'Unrealized', 'Current Balance'] = float(current_balance) # Got Negative, because no buys just sells
-    df_pnl.loc[df_pnl['PnL Type'] == 'Unrealized', 'USD Value'] = float(current_balance*current_price) 
-    df_pnl.loc[df_pnl['PnL Type'] == 'Unrealized', 'PnL'] = float((current_balance * current_price) - (current_balance * avg_buy_price))
-
-    return df_pnl
+def group_token_transactions(data):
+    """
+    Group raw transactions by (pic, exchange, token), sorted by date, for the PnL output.
+    """
+    grouped = {}
+    if not data:
+        return grouped
 
-def calculate_pnl(data):
-    all_transactions = clean_transactions(data)
-    df = pd.DataFrame(all_transactions)
+    df = pd.DataFrame(clean_transactions(data))
+    if df.empty:
+        return grouped
 
-    # Sort the dataframe by date
     df['txn_date'] = pd.to_datetime(df['txn_date'])
-    df = df.sort_values('txn_date')
+    df = df.sort_values('txn_date', kind='stable')
+    df['txn_date'] = df['txn_date'].dt.strftime('%Y-%m-%d')
 
-    portfolio_structure = {}
-    grouped_by_pic = df.groupby('pic')
-
-    for pic_name, pic_group in grouped_by_pic:
-        portfolio_structure['pic'] = portfolio_structure.get('pic', {})
-        portfolio_structure['pic'][pic_name] = {
-            'exchanges': {},
-            'total_pic_pnl': 0
-        }
-        
-        grouped_by_exchange = pic_group.groupby('exchange')
-        for exchange_name, exchange_group in grouped_by_exchange:
-            portfolio_structure['pic'][pic_name]['exchanges'][exchange_name] = {
-                'tokens': {},
-                'total_exchange_pnl': 0
-            }
-            
-            grouped_by_token = exchange_group.groupby('position')
-            for token_name, token_group in grouped_by_token:
-                # Sort token_group by date
-                token_group['txn_date'] = token_group['txn_date'].dt.strftime('%Y-%m-%d')
-
-                portfolio_structure['pic'][pic_name]['exchanges'][exchange_name]['tokens'][token_name] = {
-                    'transactions': json.loads(token_group.reset_index(drop=True).to_json(orient='records')),
-                    'pnl': None,
-                    'pnl_verification': None
-                }
+    # One JSON round trip for the whole frame, then bucket the records
+    for record in json.loads(df.to_json(orient='records')):
+        grouped.setdefault((record['pic'], record['exchange'], record['position']), []).append(record)
 
-                df_pnl = create_df_pnl(token_name)
+    return grouped
 
-                amount_bought = 0.0
-                value_spent = 0.0
-                avg_buy_price = 0.0
-                amount_sold = 0.0
-                value_sold = 0.0
+""" Calculations Section """
+def get_current_prices(df):
+    # One lookup per (exchange, token), both read from the in-memory ticker snapshot
+    price_funcs = {'bybit': get_bybit_price, 'binance': get_bin_price}
+    prices = {
+        (exchange, token): float(price_funcs[exchange](token)) if exchange in price_funcs else 0.0
+        for exchange, token in df[['exchange', 'position']].drop_duplicates().itertuples(index=False)
+    }
 
-                for txn_type, txn_group in token_group.groupby('txn_type'):
-                    if txn_type in ['Buy', 'Deposit', 'Rebate', 'Revenue', 'Commision']:
-                        amount_bought += txn_group['token_amt'].sum()
-                        value_spent += txn_group['usd_value'].sum()
-                    elif txn_type in ['Sell', 'Withdraw', 'Fee']:
-                        amount_sold += txn_group['token_amt'].sum()
-                        value_sold += txn_group['usd_value'].sum()
+    return [prices[(exchange, token)] for exchange, token in zip(df['exchange'], df['position'])]
 
-                if amount_bought > 0:
-                    avg_buy_price = value_spent / amount_bought
+def compute_pnl_frame(position_totals):
+    """
+    Compute the PnL columns for every token at once.
 
-                current_balance = amount_bought - amount_sold
-                current_price = 0
+    :param position_totals: List of dictionaries with pic, exchange, position, amount_bought, value_spent, amount_sold, value_sold
+    :return: DataFrame with one row per (pic, exchange, token)
+    """
+    df = pd.DataFrame(position_totals, columns=['pic', 'exchange', 'position', 'amount_bought', 'value_spent', 'amount_sold', 'value_sold'])
 
-                if exchange_name == "bybit":
-                    current_price = float(get_bybit_price(token_name))
-                elif exchange_name == "binance":
-                    current_price = float(get_bin_price(token_name))
+    # SOLUSDT, SOLBTC and SOL deposits all belong to SOL
+    df['position'] = normalize_positions(df['position'])
+    df = df[df['position'] != '']
+    df = df.groupby(['pic', 'exchange', 'position'], as_index=False).sum()
 
-                df_pnl_updated = update_df_pnl(df_pnl, avg_buy_price, value_sold, amount_sold, current_balance, current_price)
+    df['current_price'] = get_current_prices(df)
 
-                portfolio_structure['pic'][pic_name]['exchanges'][exchange_name]['tokens'][token_name]['pnl'] = df_pnl_updated.to_dict(orient='records')
+    bought = df['amount_bought'] > 0
+    df['avg_buy_price'] = (df['value_spent'] / df['amount_bought'].where(bought)).fillna(0.0)
+    df['current_balance'] = df['amount_bought'] - df['amount_sold']
+    df['curr_usd_value'] = df['current_balance'] * df['current_price']
 
-                curr_usd_value = current_balance * current_price
-                difference = (value_sold + curr_usd_value) - value_spent
+    df['realized_pnl'] = df['value_sold'] - (df['amount_sold'] * df['avg_buy_price'])
+    df['unrealized_pnl'] = df['curr_usd_value'] - (df['current_balance'] * df['avg_buy_price'])
+    df['total_pnl'] = df['realized_pnl'] + df['unrealized_pnl']
+    df['difference'] = (df['value_sold'] + df['curr_usd_value']) - df['value_spent']
 
-                pnl_realized = df_pnl_updated.loc[df_pnl_updated['PnL Type'] == 'Realized', 'PnL'].sum()
-                pnl_unrealized = df_pnl_updated.loc[df_pnl_updated['PnL Type'] == 'Unrealized', 'PnL'].sum()
-                
-                pnl_total = pnl_realized + pnl_unrealized
-                df_verifier = pd.DataFrame({
-                    'In Amount': [value_spent],
-                    'Out Amount': [value_sold],
-                    'Bal USD': [curr_usd_value],
-                    'Difference': [difference],
-                    'Total PNL': [pnl_total]
-                })
+    return df
 
-                portfolio_structure['pic'][pic_name]['exchanges'][exchange_name]['tokens'][token_name]['pnl_verification'] = df_verifier.to_dict(orient='records')
+def calculate_pnl(position_totals, transactions=None):
+    """
+    Build the portfolio from per position totals (see db_func.funcs.get_position_snapshot).
 
-                # Update total exchange PnL
-                portfolio_structure['pic'][pic_name]['exchanges'][exchange_name]['total_exchange_pnl'] += pnl_total
+    :param position_totals: List of dictionaries with pic, exchange, position, amount_bought, value_spent, amount_sold, value_sold
+    :param transactions: Optional raw transactions, attached to each token when given
+    """
+    df = compute_pnl_frame(position_totals)
+    token_transactions = group_token_transactions(transactions)
 
-            # Update total PIC PnL after processing all tokens for this exchange
-            portfolio_structure['pic'][pic_name]['total_pic_pnl'] += portfolio_structure['pic'][pic_name]['exchanges'][exchange_name]['total_exchange_pnl']
+    exchange_totals = df.groupby(['pic', 'exchange'])['total_pnl'].sum().to_dict()
+    pic_totals = df.groupby('pic')['total_pnl'].sum().to_dict()
 
-    return json.dumps(portfolio_structure, default=json_serial)
+    # Only the nested JSON is built row by row
+    portfolio_structure = {}
+    for row in df.to_dict('records'):
+        pic_name = row['pic']
+        exchange_name = row['exchange']
+        token_name = row['position']
 
+        pic_data = portfolio_structure.setdefault('pic', {}).setdefault(pic_name, {
+            'exchanges': {},
+            'total_pic_pnl': pic_totals[pic_name]
+        })
+        exchange_data = pic_data['exchanges'].setdefault(exchange_name, {
+            'tokens': {},
+            'total_exchange_pnl': exchange_totals[(pic_name, exchange_name)]
+        })
+
+        exchange_data['tokens'][token_name] = {
+            'transactions': token_transactions.get((pic_name, exchange_name, token_name), []),
+            'pnl': [
+                {
+                    'PnL Type': 'Realized',
+                    'Position': token_name,
+                    'Avg Buy (USD)': row['avg_buy_price'],
+                    'Sold Value (USD)': row['value_sold'],
+                    'Sold Amount': row['amount_sold'],
+                    'Current Balance': 0.0,
+                    'USD Value': 0.0,
+                    'PnL': row['realized_pnl']
+                },
+                {
+                    'PnL Type': 'Unrealized',
+                    'Position': token_name,
+                    'Avg Buy (USD)': row['avg_buy_price'],
+                    'Sold Value (USD)': 0.0,
+                    'Sold Amount': 0.0,
+                    'Current Balance': row['current_balance'],
+                    'USD Value': row['curr_usd_value'],
+                    'PnL': row['unrealized_pnl']
+                },
+            ],
+            'pnl_verification': [
+                {
+                    'In Amount': row['value_spent'],
+                    'Out Amount': row['value_sold'],
+                    'Bal USD': row['curr_usd_value'],
+                    'Difference': row['difference'],
+                    'Total PNL': row['total_pnl']
+                }
+            ]
+        }
 
+    return json.dumps(portfolio_structure, default=json_serial)
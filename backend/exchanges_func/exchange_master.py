@@ -1,25 +1,51 @@
-from exchanges_func.binance_spot_hist import save_binance_records
-from exchanges_func.bybit_spot_hist import save_bybit_records
-from exchanges_func.calculations import calculate_pnl
+from exchanges_func.ingestion import run_ingestion
+from exchanges_func.calculations import calculate_pnl, extract_significant_token
 from exchanges_func.manual_convert import process_manual 
-from db_func.funcs import get_as_dict, get_all
+from db_func.ledger_snapshot import snapshot_available, snapshot_is_current, load_transactions, write_ledger_snapshot
+from db_func.funcs import get_as_dict, get_all, get_position_snapshot, get_positions, get_by_positions, query_to_dict, retire_salted_rows
 import json
 
-def update_db(acc_owners, mode):
+def update_db(acc_owners, mode, trade_fetch='window', progress=None, heartbeat=None):
     all_unique = False
-    save_bybit_records(acc_owners, mode, all_unique)
-    save_binance_records(acc_owners, mode, all_unique)
+    progress = run_ingestion(acc_owners, mode, all_unique, trade_fetch, progress=progress, heartbeat=heartbeat)
 
-def start_calculation():
-    raw_transactions = get_as_dict(lambda: get_all())
-    portfolio_data_json = calculate_pnl(raw_transactions)
+    # One-off upgrade: drop the Binance rows saved under salted ids once they are fetched again
+    retired = retire_salted_rows()
+
+    # The snapshot is only written here (the writer), reads never refresh it
+    if snapshot_available():
+        write_ledger_snapshot(rebuild=bool(retired)) # append only, rewritten without any retired rows
+
+    return progress
+
+def start_calculation(include_transactions=False):
+    # Totals come from the maintained snapshot, the full ledger is only loaded when the transactions are wanted too
+    position_totals = get_position_snapshot()
+    raw_transactions = None
+    if include_transactions:
+        # Columnar snapshot when it is up to date, skips building an ORM object per row
+        raw_transactions = load_transactions() if snapshot_is_current() else get_as_dict(lambda: get_all())
+    portfolio_data_json = calculate_pnl(position_totals, raw_transactions)
     portfolio_data = json.loads(portfolio_data_json)
 
     return portfolio_data
 
+def get_token_transactions(pic, exchange, token):
+    # All stored positions that clean up to this token, ie: SOL -> SOL, SOLUSDT, SOLBTC
+    positions = [position for position in get_positions(pic, exchange) if extract_significant_token(position) == token]
+    transactions = query_to_dict(get_by_positions(pic, exchange, positions))
+
+    for transaction in transactions:
+        transaction['position'] = token
+
+    return transactions
+
 def convert():
     process_manual("./static/2021.csv", "binance")
     process_manual("./static/2022.csv", "binance")
 
+    if snapshot_available():
+        write_ledger_snapshot()
+
 def display_all():
     pass
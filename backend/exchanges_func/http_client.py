@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from exchanges_func.rate_limiter import acquire, observe
+
+try:
+    import aiohttp
+except ImportError: # Optional, get_many falls back to a thread pool over the pooled sessions
+    aiohttp = None
+
+"""
+    Shared HTTP client for exchange access
+    One pooled keep-alive requests.Session per exchange so TCP + TLS handshakes are reused.
+
+    Budget is taken from the rate limiter by the caller *before* signing (so the signed
+    timestamp is fresh), get() then sends the request and feeds the response headers back.
+"""
+
+TIMEOUT = float(os.getenv('EXCHANGE_HTTP_TIMEOUT', 10))
+POOL_SIZE = int(os.getenv('EXCHANGE_HTTP_POOL_SIZE', 16))
+MAX_CONCURRENCY = int(os.getenv('EXCHANGE_HTTP_MAX_CONCURRENCY', 8))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(exchange):
+    with _sessions_lock:
+        if exchange not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[exchange] = session
+        return _sessions[exchange]
+
+def get(exchange, url, params=None, headers=None, api_key=None, timeout=None):
+    """Send a GET on the exchange's pooled session and update the rate limiter from the response."""
+    response = get_session(exchange).get(url, params=params, headers=headers, timeout=timeout or TIMEOUT)
+    observe(exchange, api_key, response)
+    return response
+
+def fetch_json(exchange, url, params=None, weight=1):
+    # Public (unsigned) endpoint: take budget, send, return the JSON body or None
+    acquire(exchange, weight=weight)
+
+    try:
+        response = get(exchange, url, params=params)
+        response.raise_for_status()
+        return response.json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching {url} with {params}: {e}")
+        return None
+
+
+# Pipelined Section
+class _AsyncResponse:
+    # Just enough of a response for rate_limiter.observe
+    def __init__(self, status, headers):
+        self.status_code = status
+        self.headers = headers
+
+async def _fetch_json_async(session, semaphore, exchange, url, params, weight):
+    loop = asyncio.get_running_loop()
+
+    async with semaphore:
+        # acquire() can sleep, keep it off the event loop
+        await loop.run_in_executor(None, acquire, exchange, None, weight)
+
+        try:
+            async with session.get(url, params=params) as response:
+                observe(exchange, None, _AsyncResponse(response.status, response.headers))
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error fetching {url} with {params}: {e}")
+            return None
+
+async def _get_many_async(exchange, calls, weight, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        tasks = [_fetch_json_async(session, semaphore, exchange, url, params, weight) for url, params in calls]
+        return await asyncio.gather(*tasks)
+
+def get_many(exchange, calls, weight=1, max_concurrency=MAX_CONCURRENCY):
+    """
+        Fetch many public (unsigned) requests at once.
+
+        :param calls: list of (url, params)
+        :return: list of JSON bodies in the same order, None for failed calls
+    """
+    if not calls:
+        return []
+
+    if aiohttp is not None:
+        return asyncio.run(_get_many_async(exchange, calls, weight, max_concurrency))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        return list(pool.map(lambda call: fetch_json(exchange, call[0], call[1], weight), calls))
@@ -0,0 +1,252 @@
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# External Imports
+from db_func import app
+from db_func.funcs import get_sync_state, set_sync_state
+from exchanges_func import binance_spot_hist, bybit_spot_hist
+from exchanges_func.utils import assign_time, process_owners, convert_to_unix
+
+"""
+    Concurrent ingestion scheduler
+    Every (owner, exchange, history type) is an independent job run on a thread pool.
+    Jobs only fetch and parse, the resulting DataFrames are handed to a single writer
+    (the calling thread) so SQLite only ever sees one writer at a time.
+    Per API key limits are enforced by the shared rate limiter, which is thread safe.
+
+    Every job that finishes moves its high-water mark (SyncState.last_time) to the end of the
+    range it fetched. The "Incremental" mode starts each job from its own mark, so a sync only
+    fetches what is new since the last one.
+"""
+
+MAX_WORKERS = int(os.getenv('INGESTION_WORKERS', 8))
+
+# Incremental mode: re-read a little before the mark to catch records the exchange booked late
+SYNC_OVERLAP = timedelta(minutes=int(os.getenv('SYNC_OVERLAP_MINUTES', 60)))
+# Range used by Incremental for a stream that has never been synced
+SYNC_INITIAL_MODE = os.getenv('SYNC_INITIAL_MODE', 'Since2023')
+
+HISTORY_TYPES = ['trades', 'deposits', 'withdrawals']
+
+# assign_time modes plus Incremental
+SYNC_MODES = ['Full', 'Weekly', 'Monthly', 'Since2023', 'Incremental']
+
+# exchange -> (module, api key field, secret key field)
+EXCHANGES = {
+    'bybit': (bybit_spot_hist, 'bybit_api_key', 'bybit_secret_key'),
+    'binance': (binance_spot_hist, 'bin_api_key', 'bin_secret_key'),
+}
+
+def build_jobs(acc_owners, exchanges):
+    jobs = []
+
+    for owner in acc_owners:
+        owner_data = process_owners(owner)
+
+        for exchange in exchanges:
+            module, api_key_field, secret_key_field = EXCHANGES[exchange]
+
+            if owner_data[api_key_field] == 'none' or owner_data[secret_key_field] == 'none':
+                print(f"Skipping owner {owner_data['pic']} due to missing {exchange} API credentials")
+                continue
+
+            for history_type in HISTORY_TYPES:
+                jobs.append({
+                    'owner': owner,
+                    'owner_data': owner_data,
+                    'exchange': exchange,
+                    'history_type': history_type,
+                })
+
+    return jobs
+
+def job_key(job):
+    return f"{job['owner']}:{job['exchange']}:{job['history_type']}"
+
+def new_progress(jobs):
+    # One entry per job, updated by the workers (fetched / known) and the writer (inserted / skipped)
+    # known rows were dropped by the parsers as already saved, they never reach the writer
+    return {
+        job_key(job): {
+            'owner': job['owner'],
+            'pic': job['owner_data']['pic'],
+            'exchange': job['exchange'],
+            'history_type': job['history_type'],
+            'status': 'queued',
+            'batches': 0,
+            'fetched': 0,
+            'known': 0,
+            'inserted': 0,
+            'skipped': 0,
+            'start': None,
+            'end': None,
+            'error': None,
+        }
+        for job in jobs
+    }
+
+""" High-Water Marks """
+def hwm_stream(job):
+    # Keyed by owner, two owners can share a pic (ie: JM and JM2)
+    return f"hwm:{job['owner']}:{job['history_type']}"
+
+def get_high_water_mark(job):
+    state = get_sync_state(job['owner_data']['pic'], job['exchange'], hwm_stream(job))
+    return state.last_time if state else None
+
+def job_time_range(job, mode, start_date, end_date):
+    if mode != 'Incremental':
+        return start_date, end_date
+
+    mark = get_high_water_mark(job)
+    if mark is None:
+        start_date = assign_time(SYNC_INITIAL_MODE)[0]
+    else:
+        start_date = datetime.fromtimestamp(mark / 1000) - SYNC_OVERLAP
+
+    return start_date, datetime.now()
+
+def mark_synced(job, start_date, end_date):
+    """
+    Move the high-water mark to end_date once everything up to it is saved.
+    Only queued by run_job when every batch of the fetch reported complete coverage.
+    A range that starts after the current mark would leave a gap, it is not recorded.
+    """
+    mark = get_high_water_mark(job)
+    covered_from = mark if mark is not None else convert_to_unix(assign_time(SYNC_INITIAL_MODE)[0])
+    end_ms = convert_to_unix(end_date)
+
+    if convert_to_unix(start_date) <= covered_from and (mark is None or end_ms > mark):
+        set_sync_state(job['owner_data']['pic'], job['exchange'], hwm_stream(job), last_time_in=end_ms)
+
+def covers_range(df):
+    # Set by the fetch side, a batch that does not say it is complete is treated as a gap
+    return df.attrs.get('complete', False)
+
+def count_fetched(entry, df):
+    known = df.attrs.get('known', 0)
+    entry['fetched'] += len(df) + known
+    entry['known'] += known
+
+def run_job(job, mode, start_date, end_date, all_unique, trade_fetch, write_queue, progress):
+    """Fetch and parse one job in a worker thread, handing every batch to the writer."""
+    owner_data = job['owner_data']
+    exchange = job['exchange']
+    history_type = job['history_type']
+    module = EXCHANGES[exchange][0]
+    entry = progress[job_key(job)]
+    entry['status'] = 'running'
+
+    # Worker threads need their own app context (and session) for DB reads
+    with app.app_context():
+        start_date, end_date = job_time_range(job, mode, start_date, end_date)
+        entry['start'] = start_date.strftime('%Y-%m-%d %H:%M:%S')
+        entry['end'] = end_date.strftime('%Y-%m-%d %H:%M:%S')
+
+        if history_type == 'trades':
+            # Saved window by window (or symbol by symbol), each batch moves its checkpoint once committed
+            if exchange == 'binance' and trade_fetch == 'cursor':
+                batches = module.iter_bin_trades_incremental(owner_data, start_date, end_date, all_unique)
+            else:
+                batches = module.iter_history_checkpointed(owner_data, start_date, end_date, all_unique)
+
+            complete = True
+            for df, on_saved in batches:
+                count_fetched(entry, df)
+                complete = complete and covers_range(df)
+                write_queue.put((module.save_to_database, df, on_saved, entry))
+        else:
+            df = module.fetch_history(owner_data, history_type, start_date, end_date, all_unique)
+            count_fetched(entry, df)
+            complete = covers_range(df)
+            write_queue.put((module.save_to_database, df, None, entry))
+
+        # Whatever was fetched is still saved, but the mark only moves past a range fetched in full
+        if not complete:
+            raise RuntimeError(f"{job_key(job)}: the fetch did not cover the whole range, the high-water mark stays where it is")
+
+        # Queued behind this job's batches, so the writer only runs it once they are all saved
+        write_queue.put((None, None, lambda: mark_synced(job, start_date, end_date), entry))
+
+def drain_writes(write_queue, futures, heartbeat=None):
+    # Single writer: keep saving batches until every job is done and the queue is empty
+    # A batch that fails to save fails its job, the other jobs keep being saved
+    failed = set()
+    while True:
+        if heartbeat is not None:
+            heartbeat()
+
+        try:
+            save_func, df, on_saved, entry = write_queue.get(timeout=0.5)
+        except queue.Empty:
+            if all(future.done() for future in futures) and write_queue.empty():
+                break
+            continue
+
+        # Once a batch is lost, later checkpoints or the mark would skip over it
+        if id(entry) in failed:
+            on_saved = None
+
+        try:
+            if save_func is not None:
+                inserted, skipped = save_func(df)
+                entry['batches'] += 1
+                entry['inserted'] += inserted
+                entry['skipped'] += skipped
+            if on_saved is not None:
+                on_saved()
+        except Exception as e:
+            print(f"Ingestion write failed: {entry['pic']} {entry['exchange']} {entry['history_type']}: {e}")
+            failed.add(id(entry))
+            entry['status'] = 'failed'
+            entry['error'] = f"Write failed: {e}"
+
+def run_ingestion(acc_owners, mode, all_unique, trade_fetch='window', exchanges=('bybit', 'binance'), max_workers=MAX_WORKERS, progress=None, heartbeat=None):
+    """
+        Run every owner / exchange / history type concurrently.
+
+        :param acc_owners: a list of owners as seen in the .env file
+        :param mode: Time range mode passed to assign_time, or "Incremental" to start every job from its high-water mark
+        :param trade_fetch: "window" or "cursor" (Binance trades only)
+        :param progress: Optional dict filled with one new_progress entry per job, read it while this runs
+        :param heartbeat: Optional function called from the writer loop about every half second
+        :return: the progress dict
+    """
+    start_date, end_date = (None, None) if mode == 'Incremental' else assign_time(mode)
+    jobs = build_jobs(acc_owners, exchanges)
+    write_queue = queue.Queue()
+
+    if progress is None:
+        progress = {}
+    progress.update(new_progress(jobs))
+
+    print(f"Ingestion: running {len(jobs)} jobs on {max_workers} workers")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(run_job, job, mode, start_date, end_date, all_unique, trade_fetch, write_queue, progress): job
+            for job in jobs
+        }
+        for future, job in futures.items():
+            future.add_done_callback(lambda future, job=job: finish_job(future, job, progress))
+
+        drain_writes(write_queue, futures, heartbeat)
+
+    # Report failed jobs without stopping the others
+    for future, job in futures.items():
+        error = future.exception()
+        if error is not None:
+            print(f"Ingestion job failed: {job['owner_data']['pic']} {job['exchange']} {job['history_type']}: {error}")
+
+    return progress
+
+def finish_job(future, job, progress):
+    # The fetch side is over, the writer may still be saving its last batch
+    entry = progress[job_key(job)]
+    error = future.exception()
+    if error is None and entry['status'] == 'failed': # The writer already failed it
+        return
+    entry['status'] = 'failed' if error is not None else 'done'
+    entry['error'] = str(error) if error is not None else None
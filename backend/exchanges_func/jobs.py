@@ -0,0 +1,202 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# External Imports
+from db_func import app
+from db_func.funcs import create_job, get_job, get_jobs, update_job
+from exchanges_func.exchange_master import update_db
+from exchanges_func.ingestion import EXCHANGES
+from exchanges_func.rate_limiter import get_wait_stats
+from exchanges_func.utils import process_owners
+
+"""
+    Background job runner
+    /db_update only records a job and returns its id, a single worker thread then runs the
+    jobs one at a time, outside of any request. The Job table keeps the status and a progress
+    document (per owner / exchange / history type counts, rate limit waits) that the worker
+    saves every few seconds, so a sync can be followed from /jobs/<job_id> while it runs.
+
+    The scheduler queues an "Incremental" update every SYNC_INTERVAL_MINUTES, each stream then
+    only fetches what is new since its own high-water mark (see ingestion.py).
+"""
+
+PROGRESS_INTERVAL = 2 # seconds between progress saves
+
+SYNC_INTERVAL_MINUTES = float(os.getenv('SYNC_INTERVAL_MINUTES', 60)) # 0 turns the scheduler off
+SYNC_OWNERS = [owner.strip() for owner in os.getenv('SYNC_OWNERS', 'J,VKEE').split(',') if owner.strip()]
+
+_job_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_enqueue_lock = threading.Lock()
+_scheduler = None
+
+def now_str():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def start_worker():
+    global _worker
+
+    with _worker_lock:
+        if _worker is not None:
+            return
+
+        # Jobs left running by a previous process died with it, queued ones are picked up again
+        for job in get_jobs(status_in=['running'], limit=None):
+            update_job(job.job_id, status='failed', error='Interrupted by a restart', finished_at=now_str())
+        for job in reversed(get_jobs(status_in=['queued'], limit=None)):
+            _job_queue.put(job.job_id)
+
+        _worker = threading.Thread(target=worker_loop, name='job-worker', daemon=True)
+        _worker.start()
+
+def worker_loop():
+    while True:
+        job_id = _job_queue.get()
+
+        with app.app_context():
+            try:
+                run_update_job(job_id)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                update_job(job_id, status='failed', error=str(e), finished_at=now_str())
+
+def enqueue_update(acc_owners, mode, trade_fetch='window'):
+    """
+    Queue a database update, returns the job id.
+    A second request while one is already queued or running gets that job back instead.
+    """
+    # Start (and recover) before looking for an active job, a job left running by a crash is not one
+    start_worker()
+
+    # Locked so two requests at once cannot both find no active job and create one each
+    with _enqueue_lock:
+        for job in get_jobs(status_in=['queued', 'running'], limit=None):
+            if job.job_type == 'db_update':
+                return job.job_id
+
+        job = create_job('db_update', {'acc_owners': acc_owners, 'mode': mode, 'trade_fetch': trade_fetch})
+        _job_queue.put(job.job_id)
+
+    return job.job_id
+
+def start_scheduler(acc_owners=SYNC_OWNERS, interval_minutes=SYNC_INTERVAL_MINUTES, trade_fetch='cursor'):
+    """
+    Start the job worker, then queue an incremental update for the owners every interval_minutes,
+    in a daemon thread. The worker is started even with the scheduler off so jobs left running by
+    a crash are marked failed at startup, not when the next job is queued.
+    """
+    global _scheduler
+
+    start_worker()
+
+    if interval_minutes <= 0 or _scheduler is not None:
+        return
+
+    def scheduler_loop():
+        with app.app_context():
+            while True:
+                job_id = enqueue_update(acc_owners, 'Incremental', trade_fetch)
+                print(f"Scheduler: incremental sync queued as job {job_id}, next in {interval_minutes} minutes")
+                time.sleep(interval_minutes * 60)
+
+    _scheduler = threading.Thread(target=scheduler_loop, name='sync-scheduler', daemon=True)
+    _scheduler.start()
+
+def get_wait_keys(acc_owners):
+    # "owner:exchange" -> (exchange, api key), plus the public buckets used for pricing
+    keys = {f"public:{exchange}": (exchange, None) for exchange in EXCHANGES}
+
+    for owner in acc_owners:
+        owner_data = process_owners(owner)
+        for exchange, (module, api_key_field, secret_key_field) in EXCHANGES.items():
+            keys[f"{owner}:{exchange}"] = (exchange, owner_data[api_key_field])
+
+    return keys
+
+def run_update_job(job_id):
+    job = get_job(job_id)
+    params = json.loads(job.params)
+
+    update_job(job_id, status='running', started_at=now_str())
+    started = time.monotonic()
+
+    # Rate limit waits are counted from the start of this job
+    wait_keys = get_wait_keys(params['acc_owners'])
+    wait_baseline = {name: get_wait_stats(*key) for name, key in wait_keys.items()}
+
+    progress = {}
+    last_saved = [0.0]
+
+    def save_progress(force=False):
+        if not force and time.monotonic() - last_saved[0] < PROGRESS_INTERVAL:
+            return
+        last_saved[0] = time.monotonic()
+
+        waits = {}
+        for name, key in wait_keys.items():
+            stats = get_wait_stats(*key)
+            waits[name] = {
+                'waits': stats['waits'] - wait_baseline[name]['waits'],
+                'seconds': round(stats['seconds'] - wait_baseline[name]['seconds'], 2),
+            }
+
+        document = {
+            'elapsed_seconds': round(time.monotonic() - started, 1),
+            'streams': list(progress.values()),
+            'rate_limit_waits': waits,
+        }
+        update_job(job_id, progress=json.dumps(document))
+
+    update_db(params['acc_owners'], params['mode'], params['trade_fetch'], progress=progress, heartbeat=save_progress)
+
+    save_progress(force=True)
+    update_job(job_id, status='done', finished_at=now_str())
+
+def get_job_status(job_id):
+    """
+    Job status with totals, throughput and an ETA.
+    The ETA assumes the remaining streams take as long as the finished ones did on average.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return None
+
+    progress = json.loads(job.progress) if job.progress else {}
+    streams = progress.get('streams', [])
+    elapsed = progress.get('elapsed_seconds', 0)
+
+    finished = sum(1 for stream in streams if stream['status'] in ('done', 'failed'))
+    totals = {field: sum(stream.get(field, 0) for stream in streams) for field in ('fetched', 'known', 'inserted', 'skipped')}
+
+    eta_seconds = None
+    if job.status == 'running' and finished:
+        eta_seconds = round(elapsed / finished * (len(streams) - finished), 1)
+    elif job.status in ('done', 'failed'):
+        eta_seconds = 0
+
+    return {
+        'job_id': job.job_id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'params': json.loads(job.params),
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'elapsed_seconds': elapsed,
+        'streams_total': len(streams),
+        'streams_finished': finished,
+        'rows': totals,
+        'rows_per_second': round(totals['fetched'] / elapsed, 2) if elapsed else None,
+        'eta_seconds': eta_seconds,
+        'rate_limit_waits': progress.get('rate_limit_waits', {}),
+        'streams': streams,
+    }
+
+def list_job_statuses(limit=20):
+    return [get_job_status(job.job_id) for job in get_jobs(limit=limit)]
@@ -3,8 +3,12 @@ import csv
 from datetime import datetime
 
 # External Imports
-from db_func.funcs import add_txn
-from exchanges_func.utils import get_bin_hist_price, get_bybit_hist_price, convert_to_unix_v2
+from db_func.funcs import add_txns_bulk
+from exchanges_func.utils import get_bin_hist_prices, get_bybit_hist_prices, convert_to_unix_v2
+
+# The import ids include the USD value, imported Binance rows were priced with 1s closes.
+# Keep pricing them that way so importing the same file again maps to the same ids.
+MANUAL_BIN_INTERVAL = '1s'
 
 def map_user_id_to_pic(user_id):
         
@@ -24,64 +28,75 @@ def process_manual(csv_file_path, exchange):
     
     with open(csv_file_path, 'r') as csvfile:
         reader = csv.DictReader(csvfile)
+        rows = [row for row in reader if row['Account'] == 'Spot' and row['Operation'] != 'Transaction Fee']
+
+    # Price every row in one batch, grouped per coin
+    price_pairs = [(row['Coin'], convert_to_unix_v2(row['UTC_Time'])) for row in rows]
+    prices = {}
+
+    if exchange == "bybit":
+        prices = get_bybit_hist_prices(price_pairs)
+    elif exchange == "binance":
+        prices = get_bin_hist_prices(price_pairs, MANUAL_BIN_INTERVAL)
+
+    txns = []
+    for row in rows:
+
+        # Convert UTC_Time to the format expected by add_txns_bulk
+        timestamp = row['UTC_Time']
+        timestamp_ms = convert_to_unix_v2(timestamp) # Used for price
+        txn_date = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
+
+        # Set transaction type
+        txn_type_mapping = {
+            'Commission Rebate': 'Rebate', # Buy
+            'Commission History': 'Commision', # Buy
+            'Transaction Spend': 'Sell',
+            'Transaction Sold': 'Sell',
+            'Transaction Buy': 'Buy',
+            'Transaction Fee': 'Fee',
+            'Transaction Revenue': 'Revenue', # Buy
+            'Deposit': 'Deposit',
+            'Withdraw': 'Withdraw',
+            'Airdrop Assets': 'Airdrop',
+            'Referrer Commission': 'Commision',
+        }
+        txn_type = txn_type_mapping.get(row['Operation'], row['Operation']) # Airdrop Assets, Transfer Between Spot Account and UM Futures Account
         
-        for row in reader:
-            if row['Account'] == 'Spot' and row['Operation'] != 'Transaction Fee':
-
-                # Convert UTC_Time to the format expected by add_txn
-                timestamp = row['UTC_Time']
-                timestamp_ms = convert_to_unix_v2(timestamp) # Used for price
-                txn_date = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
-
-                # Set transaction type
-                txn_type_mapping = {
-                    'Commission Rebate': 'Rebate', # Buy
-                    'Commission History': 'Commision', # Buy
-                    'Transaction Spend': 'Sell',
-                    'Transaction Sold': 'Sell',
-                    'Transaction Buy': 'Buy',
-                    'Transaction Fee': 'Fee',
-                    'Transaction Revenue': 'Revenue', # Buy
-                    'Deposit': 'Deposit',
-                    'Withdraw': 'Withdraw',
-                    'Airdrop Assets': 'Airdrop',
-                    'Referrer Commission': 'Commision',
-                }
-                txn_type = txn_type_mapping.get(row['Operation'], row['Operation']) # Airdrop Assets, Transfer Between Spot Account and UM Futures Account
-                
-                price = 0.0
-                token_amount_in = abs(float(row['Change']))  # Absolute Value so no negatives
-                usd_value = 0.0
-
-                if exchange == "bybit":
-                    price = get_bybit_hist_price(row['Coin'],timestamp_ms)
-                elif exchange == "binance":
-                    price = get_bin_hist_price(row['Coin'],timestamp_ms)
-
-                usd_value = price * token_amount_in
-
-                # Generate a unique exchange_id using timestamp and other info
-                id_variables = f"{row['User_ID']}_{row['UTC_Time']}_{row['Operation']}_{row['Coin']}_{row['Change']}_{usd_value}"
-                exchange_id = uuid.uuid5(uuid.NAMESPACE_OID, id_variables)
-
-                print(f"Processing transaction: {exchange_id}")
-                print(f"  Date: {txn_date}")
-                print(f"  Coin: {row['Coin']}")
-                print(f"  Type: {txn_type}")
-                print(f"  Amount: {token_amount_in}")
-                print(f"  Price: {price}")
-                print(f"  USD Value: {usd_value}")
-
-                add_txn(
-                    exchange_id_in=str(exchange_id),
-                    txn_date_in=txn_date,
-                    position_in=row['Coin'],
-                    txn_type_in=txn_type,
-                    pic_in=map_user_id_to_pic(row['User_ID']),
-                    exchange_in=exchange, 
-                    token_amt_in=token_amount_in,
-                    price_in=price, 
-                    usd_amt_in=usd_value
-                )
+        token_amount_in = abs(float(row['Change']))  # Absolute Value so no negatives
+        price = prices.get((row['Coin'], timestamp_ms), 0.0)
+
+        # The id includes the USD value, a row priced at 0 now would be saved again once it is priced
+        if price is None:
+            print(f"No price for {row['Coin']} at {timestamp}, skipping, run the conversion again to retry")
+            continue
+        usd_value = price * token_amount_in
+
+        # Generate a unique exchange_id using timestamp and other info
+        id_variables = f"{row['User_ID']}_{row['UTC_Time']}_{row['Operation']}_{row['Coin']}_{row['Change']}_{usd_value}"
+        exchange_id = uuid.uuid5(uuid.NAMESPACE_OID, id_variables)
+
+        print(f"Processing transaction: {exchange_id}")
+        print(f"  Date: {txn_date}")
+        print(f"  Coin: {row['Coin']}")
+        print(f"  Type: {txn_type}")
+        print(f"  Amount: {token_amount_in}")
+        print(f"  Price: {price}")
+        print(f"  USD Value: {usd_value}")
+
+        txns.append({
+            'exchange_id': str(exchange_id),
+            'txn_date': txn_date,
+            'position': row['Coin'],
+            'txn_type': txn_type,
+            'pic': map_user_id_to_pic(row['User_ID']),
+            'exchange': exchange,
+            'token_amt': token_amount_in,
+            'token_price': price,
+            'usd_value': usd_value
+        })
+
+    # Write the whole file in one transaction
+    add_txns_bulk(txns)
 
     print(f"Finished processing {csv_file_path} for {exchange}")
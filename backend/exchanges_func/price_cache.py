@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db_func import app
+
+"""
+    Persistent cache for historical prices
+    Past candles never change, so every close we fetch is kept forever in a small SQLite
+    file next to site.db, keyed by (exchange, asset, interval, bucket timestamp).
+    An in-memory LRU sits in front of it so repeated lookups never touch the disk.
+
+    This is a separate database file on purpose: prices are written from the ingestion
+    worker threads, while site.db only ever has the single ingestion writer.
+
+    Only real closes are kept. A candle missing from a successful response (a gap, or one that
+    has not closed yet) is remembered in memory for MISS_TTL seconds and then asked for again.
+"""
+
+CACHE_PATH = os.getenv('PRICE_CACHE_PATH', os.path.join(app.instance_path, 'price_cache.db'))
+LRU_SIZE = int(os.getenv('PRICE_CACHE_LRU_SIZE', 100000))
+MISS_TTL = int(os.getenv('PRICE_CACHE_MISS_TTL', 300)) # seconds
+
+# Interval length in ms, used to find the candle a timestamp falls in
+INTERVAL_MS = {
+    '1s': 1000,
+    '1m': 60 * 1000,
+}
+
+_lru = OrderedDict()
+_misses = {} # key -> monotonic time the miss expires
+_lock = threading.Lock()
+_conn = None
+
+def _get_conn():
+    global _conn
+
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute('PRAGMA journal_mode=WAL')
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS hist_price (
+                exchange TEXT NOT NULL,
+                asset TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (exchange, asset, interval, bucket)
+            )
+        """)
+        # Older versions stored missing candles as 0, drop them so they are fetched again
+        _conn.execute('DELETE FROM hist_price WHERE price = 0')
+        _conn.commit()
+
+    return _conn
+
+def bucket_timestamp(timestamp, interval):
+    # Start of the candle the timestamp (ms) falls in
+    timestamp = int(timestamp)
+    return timestamp - timestamp % INTERVAL_MS[interval]
+
+def _remember(key, price):
+    _lru[key] = price
+    _lru.move_to_end(key)
+    if len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+def get_cached_price(exchange, asset, interval, bucket):
+    """Return the cached close for a candle, or None if we have never fetched it."""
+    key = (exchange, asset, interval, bucket)
+
+    with _lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            return _lru[key]
+
+        row = _get_conn().execute(
+            'SELECT price FROM hist_price WHERE exchange=? AND asset=? AND interval=? AND bucket=?', key
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        _remember(key, row[0])
+        return row[0]
+
+def set_cached_prices(rows):
+    """Store many (exchange, asset, interval, bucket, price) rows in one transaction."""
+    # Only closed candles are immutable, the current one can still move. 0 is never a real close.
+    now_ms = time.time() * 1000
+    rows = [row for row in rows if row[4] and row[3] + INTERVAL_MS[row[2]] <= now_ms]
+
+    with _lock:
+        for row in rows:
+            _remember(row[:4], row[4])
+        conn = _get_conn()
+        conn.executemany('INSERT OR REPLACE INTO hist_price (exchange, asset, interval, bucket, price) VALUES (?, ?, ?, ?, ?)', rows)
+        conn.commit()
+
+def remember_missing(keys):
+    """Remember (exchange, asset, interval, bucket) candles a response did not have, for MISS_TTL seconds."""
+    now = time.monotonic()
+
+    with _lock:
+        for key in keys:
+            _misses[key] = now + MISS_TTL
+
+        if len(_misses) > LRU_SIZE:
+            for key in [key for key, expires in _misses.items() if expires <= now]:
+                del _misses[key]
+
+def is_recent_miss(exchange, asset, interval, bucket):
+    key = (exchange, asset, interval, bucket)
+
+    with _lock:
+        expires = _misses.get(key)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del _misses[key]
+            return False
+        return True
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+
+from exchanges_func import http_client
+
+"""
+    Live price snapshot
+    One request per exchange returns every spot ticker, which is kept in memory for
+    PRICE_SNAPSHOT_TTL seconds. A PnL run then looks every token up in memory instead
+    of sending one ticker request per token.
+
+    A failed fetch is not retried for PRICE_SNAPSHOT_BACKOFF seconds, every lookup in the
+    meantime gets no price instead of waiting on the request again (ie: offline).
+"""
+
+TTL = float(os.getenv('PRICE_SNAPSHOT_TTL', 30))
+BACKOFF = float(os.getenv('PRICE_SNAPSHOT_BACKOFF', 30))
+
+_snapshots = {} # exchange -> (fetched_at, {symbol: price})
+_failed_at = {} # exchange -> time of the last failed fetch
+_lock = threading.Lock()
+
+def fetch_snapshot(exchange):
+    prices = {}
+
+    if exchange == 'binance':
+        data = http_client.fetch_json('binance', 'https://api.binance.com/api/v3/ticker/price', weight=4)
+        for ticker in data or []:
+            prices[ticker.get('symbol')] = float(ticker.get('price', 0.0))
+
+    elif exchange == 'bybit':
+        data = http_client.fetch_json('bybit', 'https://api.bybit.com/v5/market/tickers', params={'category': 'spot'})
+        for ticker in (data or {}).get('result', {}).get('list', []):
+            if ticker.get('lastPrice') is not None:
+                prices[ticker.get('symbol')] = float(ticker.get('lastPrice'))
+
+    return prices
+
+def get_price_snapshot(exchange):
+    """Every spot symbol -> last price for the exchange, refreshed once the TTL has passed."""
+    with _lock:
+        fetched_at, prices = _snapshots.get(exchange, (0.0, {}))
+
+        if time.monotonic() - fetched_at > TTL or not prices:
+            if exchange in _failed_at and time.monotonic() - _failed_at[exchange] < BACKOFF:
+                return {}
+
+            prices = fetch_snapshot(exchange)
+            # Keep an empty (failed) snapshot out of the cache, only the failure is remembered
+            if prices:
+                _snapshots[exchange] = (time.monotonic(), prices)
+                _failed_at.pop(exchange, None)
+            else:
+                _failed_at[exchange] = time.monotonic()
+
+        return prices
@@ -0,0 +1,130 @@
+import threading
+import time
+
+"""
+    Shared rate limiter for every exchange call
+    One token bucket per (exchange, api key). Public endpoints use the "public" bucket.
+
+    Buckets start from the documented limits below and are then corrected from the
+    usage headers the exchanges send back on every response:
+        Binance: X-MBX-USED-WEIGHT-1M (weight used in the current minute), Retry-After on 429 / 418
+        Bybit: X-Bapi-Limit, X-Bapi-Limit-Status (requests remaining), X-Bapi-Limit-Reset-Timestamp (ms)
+"""
+
+# capacity = tokens available per window, window = seconds for a full refill
+DEFAULT_LIMITS = {
+    'binance': {'capacity': 6000, 'window': 60},
+    'bybit': {'capacity': 10, 'window': 1},
+}
+
+class TokenBucket:
+    def __init__(self, capacity, window):
+        self.capacity = capacity
+        self.window = window
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.window)
+        self.updated = now
+
+    def acquire(self, weight=1):
+        """Block until `weight` tokens are available, returns the seconds spent waiting."""
+        waited = 0.0
+
+        while True:
+            with self.lock:
+                self._refill()
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    sleep_time = self.paused_until - now
+                elif self.tokens >= weight:
+                    self.tokens -= weight
+                    return waited
+                else:
+                    sleep_time = (weight - self.tokens) * self.window / self.capacity
+
+            time.sleep(sleep_time)
+            waited += sleep_time
+
+    def sync(self, remaining, capacity=None):
+        # Trust the exchange's own count over our estimate
+        with self.lock:
+            if capacity:
+                self.capacity = capacity
+            self.tokens = max(0.0, min(self.capacity, remaining))
+            self.updated = time.monotonic()
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+# (exchange, api key) -> number of waits and total seconds waited, for job progress reporting
+_wait_stats = {}
+_wait_stats_lock = threading.Lock()
+
+def get_bucket(exchange, api_key=None):
+    key = (exchange, api_key or 'public')
+
+    with _buckets_lock:
+        if key not in _buckets:
+            limits = DEFAULT_LIMITS[exchange]
+            _buckets[key] = TokenBucket(limits['capacity'], limits['window'])
+        return _buckets[key]
+
+def acquire(exchange, api_key=None, weight=1):
+    """Wait for budget before sending a request. Returns the seconds spent waiting."""
+    waited = get_bucket(exchange, api_key).acquire(weight)
+
+    if waited > 0:
+        with _wait_stats_lock:
+            stats = _wait_stats.setdefault((exchange, api_key or 'public'), {'waits': 0, 'seconds': 0.0})
+            stats['waits'] += 1
+            stats['seconds'] += waited
+
+    if waited > 1:
+        print(f"Rate limiter: waited {waited:.2f} seconds for {exchange}")
+
+    return waited
+
+def get_wait_stats(exchange, api_key=None):
+    """Waits so far for one bucket: {'waits': count, 'seconds': total seconds}."""
+    with _wait_stats_lock:
+        return dict(_wait_stats.get((exchange, api_key or 'public'), {'waits': 0, 'seconds': 0.0}))
+
+def observe(exchange, api_key, response):
+    """Update the bucket from the response headers, pausing it when the exchange says so."""
+    bucket = get_bucket(exchange, api_key)
+    headers = response.headers
+
+    if exchange == 'binance':
+        used = headers.get('X-MBX-USED-WEIGHT-1M')
+        if used is not None:
+            bucket.sync(bucket.capacity - int(used))
+
+        if response.status_code in (418, 429):
+            retry_after = int(headers.get('Retry-After', 60))
+            print(f"Binance rate limit hit. Pausing for {retry_after} seconds.")
+            bucket.pause(retry_after)
+
+    elif exchange == 'bybit':
+        limit = headers.get('X-Bapi-Limit')
+        remaining = headers.get('X-Bapi-Limit-Status')
+        reset_ms = headers.get('X-Bapi-Limit-Reset-Timestamp')
+
+        if remaining is not None:
+            bucket.sync(int(remaining), int(limit) if limit else None)
+
+        if response.status_code == 429 or remaining == '0':
+            reset_in = (int(reset_ms) / 1000 - time.time()) if reset_ms else bucket.window
+            bucket.pause(max(reset_in, 0.0))
@@ -2,9 +2,13 @@ import json
 import math
 import os
 from datetime import datetime, timedelta
-import requests
 import uuid
 
+from exchanges_func.rate_limiter import acquire
+from exchanges_func import http_client
+from exchanges_func.price_snapshot import get_price_snapshot
+from exchanges_func.price_cache import INTERVAL_MS, bucket_timestamp, get_cached_price, set_cached_prices, remember_missing, is_recent_miss
+
 def save_to_json(data, filename):
     with open(filename, 'w') as json_file:
         json.dump(data, json_file, indent=4)
@@ -104,7 +108,8 @@ def generate_custom_uuid(all_unique=False, *args):
 # Binance
 def get_binance_symbols():
     url = "https://api.binance.com/api/v3/exchangeInfo"
-    response = requests.get(url)
+    acquire('binance', weight=20)
+    response = http_client.get('binance', url)
     data = response.json()
 
     symbols = data.get('symbols')
@@ -118,7 +123,9 @@ def get_binance_symbols():
         if status == 'TRADING':
             if any(symbol.endswith(ending) or symbol.startswith(ending) for ending in valid_endings):
                 symbol_list = {
-                    'symbol': symbol
+                    'symbol': symbol,
+                    'base_asset': item.get('baseAsset'),
+                    'quote_asset': item.get('quoteAsset')
                 }
                 all_symbols.append(symbol_list)
     
@@ -142,51 +149,25 @@ def get_bin_price(asset):
     if asset in ['USDT', 'USDC', 'BUSD']:
         return 1.0
     
-    # If not, fetch the price from the API
-    url = f'https://api.binance.com/api/v3/ticker/price?symbol={asset}USDT'
-    response = requests.get(url)
-    data = response.json() 
-
-    # Convert price to float and cache it
-    result = data.get('result', {})
-    list_data = result.get('list', [])
-
-    if list_data:
-        lastPrice = list_data[0].get('lastPrice')
-        if lastPrice is not None:
-            return float(lastPrice)
-    
-    # Convert price to float and cache it
-    price = float(data.get('price', 0.0))
-    # price_cache[asset] = price
-    
-    return price
+    # Read from the shared ticker snapshot instead of one request per token
+    price = get_price_snapshot('binance').get(f"{asset}USDT")
 
-def get_bin_hist_price(asset, timestamp):
-    # Stablecoins
-    if asset in ['USDT', 'USDC', 'BUSD']:
-        return 1.0
+    if price is None:
+        print(f"Price for {asset} could not be found.")
+        return 0.0
 
-    query = f"symbol={asset}USDT&interval=1s&startTime={timestamp}&endTime={timestamp}"  # 1s interval
-    url = f"https://api.binance.com/api/v3/klines?{query}"
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data:  # If data exists
-            return float(data[0][4])  # Return closing price
-        else:  # If data is empty (doesn't exist for the timestamp)
-            print(f"No data exists for {asset} at timestamp {timestamp}")
-            return 0
-    except requests.RequestException as e:
-        print(f"Error fetching data for {asset} at timestamp {timestamp}: {e}")
-        return 0
-    except (ValueError, IndexError) as e:
-        print(f"Error processing data for {asset} at timestamp {timestamp}: {e}")
-        return 0
+    return price
+
+def get_bin_hist_prices(pairs, interval=None):
+    """
+    Price many (asset, timestamp) pairs with the 1m Binance klines.
 
+    :param pairs: iterable of (asset, timestamp in ms)
+    :param interval: kline interval ('1s' or '1m'), defaults to HIST_INTERVAL
+    :return: dict of (asset, timestamp) -> closing price, 0.0 when Binance has no {asset}USDT market,
+             None when the price could not be fetched this time
+    """
+    return get_hist_prices('binance', pairs, interval)
 
 # Bybit
 def get_bybit_price(asset):
@@ -200,53 +181,167 @@ def get_bybit_price(asset):
     if asset in ['USDT', 'USDC', 'BUSD']:
         return 1.0
     
-    # If not, fetch the price from the API
-    url = f'https://api.bybit.com/v5/market/tickers?category=spot&symbol={asset}USDT'
-    response = requests.get(url)
-    data = response.json()
-
-    # Convert price to float and cache it
-    result = data.get('result', {})
-    list_data = result.get('list', [])
+    # Read from the shared ticker snapshot instead of one request per token
+    price = get_price_snapshot('bybit').get(f"{asset}USDT")
 
-    if list_data:
-        lastPrice = list_data[0].get('lastPrice')
-        if lastPrice is not None:
-            return float(lastPrice)
+    if price is None:
+        print(f"Price for {asset} could not be found.")
+        return 0
 
-    # If price cannot be found
-    print(f"Price for {asset} could not be found.")
-    return 0
+    return price
     
 
-def get_bybit_hist_price(asset, timestamp):
-    category = 'spot'
+def get_bybit_hist_prices(pairs):
+    """
+    Price many (asset, timestamp) pairs with the 1m Bybit spot klines.
 
-    # Stablecoins
-    if asset in ['USDT', 'USDC', 'BUSD']:
-        return 1.0
+    :param pairs: iterable of (asset, timestamp in ms)
+    :return: dict of (asset, timestamp) -> closing price, 0.0 when Bybit has no {asset}USDT market,
+             None when the price could not be fetched this time
+    """
+    return get_hist_prices('bybit', pairs)
 
-    query = f"symbol={asset}USDT&interval=1&category={category}&start={timestamp}&end={timestamp}"  # 1m interval
-    url = f"https://api.bybit.com/v5/market/kline?{query}"
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        print(data)
-        
-        if data.get("result", {}).get("list"):  # Check if data exists
-            closing_price = float(data["result"]["list"][0][4])
-            return closing_price
-        else:  # If data is empty or doesn't exist for the timestamp
-            print(f"No data exists for {asset} at timestamp {timestamp}")
-            return 0
-    except requests.RequestException as e:
-        print(f"Error fetching data for {asset} at timestamp {timestamp}: {e}")
-        return 0
-    except (ValueError, IndexError, KeyError) as e:
-        print(f"Error processing data for {asset} at timestamp {timestamp}: {e}")
-        return 0
+
+# Batch Historical Prices
+# 1m candles: one 1000 candle request spans ~16.7 hours (1s candles only covered ~16.7 minutes)
+HIST_INTERVAL = {'binance': '1m', 'bybit': '1m'}
+KLINE_LIMIT = 1000
+
+def chunk_buckets(buckets, interval):
+    # Group sorted candle starts so each group fits in one kline request
+    span = INTERVAL_MS[interval] * (KLINE_LIMIT - 1)
+    chunks = []
+
+    for bucket in sorted(buckets):
+        if chunks and bucket <= chunks[-1][0] + span:
+            chunks[-1].append(bucket)
+        else:
+            chunks.append([bucket])
+
+    return chunks
+
+def kline_call(exchange, asset, start, end, interval):
+    if exchange == 'binance':
+        url = "https://api.binance.com/api/v3/klines"
+        params = {'symbol': f"{asset}USDT", 'interval': interval, 'startTime': start, 'endTime': end, 'limit': KLINE_LIMIT}
+    else:
+        url = "https://api.bybit.com/v5/market/kline"
+        params = {'category': 'spot', 'symbol': f"{asset}USDT", 'interval': '1', 'start': start, 'end': end, 'limit': KLINE_LIMIT}
+
+    return url, params
+
+def parse_kline_closes(exchange, data):
+    # Candle start -> close, None if the response was an error
+    if exchange == 'binance':
+        if not isinstance(data, list):
+            return None
+        candles = data
+    else:
+        if not isinstance(data, dict) or data.get('retCode') != 0:
+            return None
+        candles = data.get('result', {}).get('list', [])
+
+    return {int(candle[0]): float(candle[4]) for candle in candles}
+
+def get_hist_prices(exchange, pairs, interval=None):
+    # Bybit only has the 1m interval here, Binance also takes 1s (see manual_convert)
+    interval = interval or HIST_INTERVAL[exchange]
+    pairs = list(pairs)
+    prices = {}
+    buckets = {}
+    missing = {} # asset -> set of candle starts not in the cache
+
+    # Listed markets, an asset without a USDT market (ie: delisted, LD* tokens) will never have a price
+    # An empty snapshot means the fetch failed, every asset is then tried as if it had a market
+    markets = get_price_snapshot(exchange)
+
+    for asset, timestamp in pairs:
+        # Stablecoins
+        if asset in ['USDT', 'USDC', 'BUSD']:
+            prices[(asset, timestamp)] = 1.0
+            continue
+
+        # Saved at 0 for good, instead of being left unpriced on every run
+        if markets and f"{asset}USDT" not in markets:
+            prices[(asset, timestamp)] = 0.0
+            continue
+
+        try:
+            bucket = bucket_timestamp(timestamp, interval)
+        except (TypeError, ValueError) as e:
+            print(f"Error processing data for {asset} at timestamp {timestamp}: {e}")
+            prices[(asset, timestamp)] = None
+            continue
+
+        buckets[(asset, timestamp)] = bucket
+        if get_cached_price(exchange, asset, interval, bucket) is None and not is_recent_miss(exchange, asset, interval, bucket):
+            missing.setdefault(asset, set()).add(bucket)
+
+    # One kline request per asset per 1000 candles instead of one per row
+    calls = []
+    call_chunks = []
+    for asset, asset_buckets in missing.items():
+        for chunk in chunk_buckets(asset_buckets, interval):
+            calls.append(kline_call(exchange, asset, chunk[0], chunk[-1], interval))
+            call_chunks.append((asset, chunk))
+
+    if calls:
+        print(f"{exchange}: pricing {sum(len(chunk) for _, chunk in call_chunks)} candles with {len(calls)} kline requests")
+
+    weight = 2 if exchange == 'binance' else 1
+    fetched = {}
+    absent = []
+    for (asset, chunk), data in zip(call_chunks, http_client.get_many(exchange, calls, weight=weight)):
+        closes = parse_kline_closes(exchange, data)
+        if closes is None: # Request failed, leave it uncached so it is retried next time
+            print(f"Error fetching data for {asset} between {chunk[0]} and {chunk[-1]}")
+            continue
+
+        for bucket in chunk:
+            if closes.get(bucket):
+                fetched[(asset, bucket)] = closes[bucket]
+            else: # Not in the response, only remembered for a short while
+                absent.append((exchange, asset, interval, bucket))
+
+    set_cached_prices([(exchange, asset, interval, bucket, price) for (asset, bucket), price in fetched.items()])
+    remember_missing(absent)
+
+    for (asset, timestamp), bucket in buckets.items():
+        price = fetched.get((asset, bucket))
+        if price is None:
+            price = get_cached_price(exchange, asset, interval, bucket)
+        # Unpriced rows are left to the caller, deposit / withdrawal ids include the price so a 0 would stick
+        if price is None:
+            print(f"No price for {asset} at timestamp {timestamp}")
+        prices[(asset, timestamp)] = price
+
+    return prices
+
+def peek_hist_prices(exchange, pairs):
+    """
+    Prices from the cache only, never sends a request.
+
+    :param pairs: iterable of (asset, timestamp in ms)
+    :return: dict of (asset, timestamp) -> the price get_hist_prices would return, None when it is not cached
+    """
+    interval = HIST_INTERVAL[exchange]
+    prices = {}
+
+    for asset, timestamp in pairs:
+        # Stablecoins
+        if asset in ['USDT', 'USDC', 'BUSD']:
+            prices[(asset, timestamp)] = 1.0
+            continue
+
+        try:
+            bucket = bucket_timestamp(timestamp, interval)
+        except (TypeError, ValueError):
+            prices[(asset, timestamp)] = None
+            continue
+
+        prices[(asset, timestamp)] = get_cached_price(exchange, asset, interval, bucket)
+
+    return prices
 
 # Owner Loop
 def process_owners(owner):
@@ -276,6 +371,7 @@ def process_owners(owner):
         "bin_api_key": bin_api_key,
         "bin_secret_key": bin_secret_key,
         "pic": pic.get(owner),
+        "owner": owner,
     }
 
     return owner_data
\ No newline at end of file
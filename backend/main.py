@@ -1,8 +1,18 @@
 from db_func import app
+from db_func.funcs import initiate
 from routes import *
+from exchanges_func.jobs import start_scheduler
+import os
+
+# Create missing tables, indexes and triggers on startup, an existing site.db may predate some of them
+initiate()
 
 if __name__ == '__main__' : 
 
+    # With the reloader on, only the child process that serves requests runs the scheduler
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_scheduler()
+
     app.run(host="0.0.0.0", port=5001, debug=True)
 
 # TODO:
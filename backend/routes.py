@@ -1,7 +1,11 @@
-from db_func.funcs import get_as_dict, get_all, initiate
+from db_func.funcs import get_as_dict, get_all, explain_query_plans, get_transaction_page, parse_cursor, parse_fields, count_transactions, export_transactions, rebuild_position_snapshot, PAGE_LIMIT_MAX, PAGE_FIELDS
 from db_func import app
-from exchanges_func.exchange_master import update_db, start_calculation, convert
-from flask import render_template
+from db_func.ledger_snapshot import write_ledger_snapshot
+from exchanges_func.exchange_master import start_calculation, convert, get_token_transactions
+from exchanges_func.jobs import enqueue_update, get_job_status, list_job_statuses
+from exchanges_func.ingestion import SYNC_MODES
+from flask import render_template, request, Response, stream_with_context
+import click
 from flask_cors import CORS
 
 # Enable CORS for all routes
@@ -17,40 +21,125 @@ def home():
 @app.route("/view_pnl", methods=["GET"])
 def view_pnl():
     
-    json_portfolio = start_calculation()
+    json_portfolio = start_calculation(include_transactions=True)
 
     return render_template('view_pnl.html', portfolio=json_portfolio)
 
 
 # Backend Routes
+def transaction_filters():
+    # pic, exchange, position, txn_type, date_from, date_to
+    return {key: value for key, value in request.args.items() if key not in ('cursor', 'limit', 'fields')}
+
 @app.route("/all_transaction", methods=["GET"])
 def all_transaction():
 
-    all_transactions = get_as_dict(lambda: get_all())
+    # A non numeric limit falls back to the default
+    limit = min(max(request.args.get('limit', 100, type=int), 1), PAGE_LIMIT_MAX)
+    fields = request.args.get('fields')
+    if fields:
+        try:
+            fields = parse_fields(fields)
+        except ValueError as e:
+            return {'error': f"{e}, valid fields are: {', '.join(PAGE_FIELDS)}"}, 400
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            parse_cursor(cursor)
+        except ValueError:
+            return {'error': "Invalid cursor, pass the next_cursor of the previous page"}, 400
+
+    transaction_page = get_transaction_page(transaction_filters(), cursor, limit, fields)
+
+    return transaction_page
+
+@app.route("/transaction_count", methods=["GET"])
+def transaction_count():
+
+    total = count_transactions(transaction_filters())
 
-    return all_transactions
+    return {'total': total}
 
 
+@app.route("/export_transactions", methods=["GET"])
+def export_all_transactions():
+
+    # Streamed chunk by chunk, memory stays flat whatever the ledger size
+    export_format = request.args.get('format', 'ndjson')
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+
+    return Response(stream_with_context(export_transactions(export_format)), mimetype=mimetype)
+
 @app.route("/db_update", methods=["GET"])
 def start_update_db():
     acc_owners = ['J', 'VKEE']
     #acc_owners = ['J', 'JM2', 'VKEE', 'KS']
 
-    initiate()
-    update_db(acc_owners,"Since2023")
+    # "Incremental" only fetches what is new since the last completed sync of each stream
+    mode = request.args.get('mode', "Since2023")
+    if mode not in SYNC_MODES:
+        return {'error': f"Invalid mode, choose one of {SYNC_MODES}"}, 400
+
+    # Runs on the background job worker, poll /jobs/<job_id> for progress
+    job_id = enqueue_update(acc_owners, mode, trade_fetch="cursor")
+
+    return {'job_id': job_id, 'status_url': f"/jobs/{job_id}"}, 202
+
+@app.route("/jobs", methods=["GET"])
+def jobs():
 
-    return "I am updating the database"
+    return list_job_statuses(limit=request.args.get('limit', default=20, type=int))
+
+@app.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id):
+
+    status = get_job_status(job_id)
+    if status is None:
+        return {'error': f"Job {job_id} not found"}, 404
+
+    return status
 
 @app.route("/calc_pnl", methods=["GET"])
 def start_calc_pnl():
     
-    json_portfolio = start_calculation()
+    # Transactions are left out unless asked for, the frontend loads them per token
+    include_transactions = request.args.get('transactions') == '1'
+    json_portfolio = start_calculation(include_transactions)
 
     return json_portfolio
 
+@app.route("/token_transactions", methods=["GET"])
+def token_transactions():
+
+    transactions = get_token_transactions(request.args.get('pic'), request.args.get('exchange'), request.args.get('token'))
+
+    return transactions
+
 @app.route("/manual", methods=["GET"])
 def manual():
     
     convert()
 
-    return "Updated DB Manually"
\ No newline at end of file
+    return "Updated DB Manually"
+
+@app.route("/query_plans", methods=["GET"])
+def query_plans():
+
+    return explain_query_plans()
+
+@app.cli.command("rebuild-positions")
+def rebuild_positions():
+    """Check the position snapshot against a full recompute and rebuild it."""
+    result = rebuild_position_snapshot()
+
+    for mismatch in result['mismatched']:
+        print(f"Mismatch {mismatch['position']}: snapshot {mismatch['snapshot']}, expected {mismatch['expected']}")
+
+@app.cli.command("snapshot-ledger")
+@click.option("--rebuild", is_flag=True, help="Rewrite the whole snapshot instead of appending new rows.")
+def snapshot_ledger(rebuild):
+    """Write new transactions to the Parquet ledger snapshot."""
+    result = write_ledger_snapshot(rebuild=rebuild)
+
+    print(f"Ledger snapshot: {result['written']} rows written, watermark at txn_id {result['last_id']}")
@@ -0,0 +1,37 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before db_func is imported
+_tmp_dir = tempfile.mkdtemp(prefix='pnl-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'site.db')}"
+os.environ['PRICE_CACHE_PATH'] = os.path.join(_tmp_dir, 'price_cache.db')
+os.environ['LEDGER_SNAPSHOT_PATH'] = os.path.join(_tmp_dir, 'ledger_snapshot')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_func import db
+from db_func.dedup_index import reset_known_ids
+from db_func.funcs import initiate
+from exchanges_func import http_client, price_snapshot
+
+
+@pytest.fixture(autouse=True)
+def database():
+    # Every test starts from an empty ledger
+    db.drop_all()
+    shutil.rmtree(os.environ['LEDGER_SNAPSHOT_PATH'], ignore_errors=True)
+    initiate()
+    reset_known_ids()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    # No test talks to an exchange, public requests fail (as offline) unless a test stubs them
+    monkeypatch.setattr(http_client, 'fetch_json', lambda *args, **kwargs: None)
+    monkeypatch.setattr(price_snapshot, '_snapshots', {})
+    monkeypatch.setattr(price_snapshot, '_failed_at', {})
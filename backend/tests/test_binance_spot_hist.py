@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import requests
+
+from exchanges_func import binance_spot_hist
+from db_func.funcs import add_txns_bulk
+
+SYMBOLS = [
+    {'symbol': 'SOLUSDT', 'base_asset': 'SOL', 'quote_asset': 'USDT'},
+    {'symbol': 'PEPEUSDT', 'base_asset': 'PEPE', 'quote_asset': 'USDT'},
+    {'symbol': 'ETHUSDT', 'base_asset': 'ETH', 'quote_asset': 'USDT'},
+]
+START, END = datetime(2024, 1, 1), datetime(2024, 3, 1)
+
+
+def stub_exchange(monkeypatch, traded, deposits=None):
+    calls = {'deposits': 0, 'withdrawals': 0}
+
+    def transfers(history_type):
+        def loop(*args):
+            calls[history_type] += 1
+            if deposits is None:
+                raise RuntimeError(f"Binance {history_type}: window could not be fetched")
+            return deposits if history_type == 'deposits' else []
+        return loop
+
+    monkeypatch.setattr(binance_spot_hist, 'get_binance_symbols', lambda: SYMBOLS)
+    monkeypatch.setattr(binance_spot_hist, 'get_bin_account_balances', lambda *args: [])
+    monkeypatch.setattr(binance_spot_hist, 'get_binance_trades_from_id', lambda key, secret, symbol, from_id: [{'id': 1}] if symbol in traded else [])
+    monkeypatch.setattr(binance_spot_hist, 'loop_get_bin_deposit', transfers('deposits'))
+    monkeypatch.setattr(binance_spot_hist, 'loop_get_bin_withdraw', transfers('withdrawals'))
+    monkeypatch.setattr(binance_spot_hist, '_transfer_cache', {})
+    return calls
+
+
+def store_trade(symbol):
+    add_txns_bulk([{
+        'exchange_id': f"trade-{symbol}", 'txn_date': '2023-06-01', 'position': symbol, 'txn_type': 'Buy',
+        'pic': 'Test', 'exchange': 'binance', 'token_amt': 1.0, 'token_price': 1.0, 'usd_value': 1.0,
+    }])
+
+
+def test_first_sync_probes_every_symbol(monkeypatch):
+    # PEPE was bought and sold within the range: no balance, no transfer, nothing stored
+    stub_exchange(monkeypatch, traded={'PEPEUSDT'}, deposits=[])
+
+    discovered, probed = binance_spot_hist.discover_binance_symbols('key', 'secret', 'Test', START, END)
+
+    assert [item['symbol'] for item in discovered] == ['PEPEUSDT']
+    assert probed
+
+
+def test_later_syncs_use_the_candidates_and_share_transfers(monkeypatch):
+    store_trade('SOLUSDT')
+    calls = stub_exchange(monkeypatch, traded=set(), deposits=[{'coin': 'ETH', 'status': 1}])
+
+    discovered, probed = binance_spot_hist.discover_binance_symbols('key', 'secret', 'Test', START, END)
+    deposits = binance_spot_hist.get_bin_transfers('deposits', 'key', 'secret', START, END)
+
+    assert {item['symbol'] for item in discovered} == {'SOLUSDT', 'ETHUSDT'}
+    assert deposits == [{'coin': 'ETH', 'status': 1}]
+    assert calls == {'deposits': 1, 'withdrawals': 1}
+
+
+def test_failed_transfer_fetch_falls_back_to_probing(monkeypatch):
+    store_trade('SOLUSDT')
+    stub_exchange(monkeypatch, traded={'SOLUSDT', 'PEPEUSDT'}, deposits=None)
+
+    discovered, probed = binance_spot_hist.discover_binance_symbols('key', 'secret', 'Test', START, END)
+
+    assert {item['symbol'] for item in discovered} == {'SOLUSDT', 'PEPEUSDT'}
+
+
+def test_owner_without_trades_is_probed_once(monkeypatch):
+    # Only a manually imported coin row, it stores "SOL" and never counts as a traded symbol
+    add_txns_bulk([{
+        'exchange_id': 'manual-SOL', 'txn_date': '2023-06-01', 'position': 'SOL', 'txn_type': 'Deposit',
+        'pic': 'Test', 'exchange': 'binance', 'token_amt': 1.0, 'token_price': 1.0, 'usd_value': 1.0,
+    }])
+    stub_exchange(monkeypatch, traded=set(), deposits=[])
+    owner_data = {'owner': 'TEST', 'pic': 'Test', 'bin_api_key': 'key', 'bin_secret_key': 'secret'}
+
+    for df, on_saved in binance_spot_hist.iter_bin_trades_incremental(owner_data, START, END, False):
+        on_saved()
+
+    probes = []
+    monkeypatch.setattr(binance_spot_hist, 'probe_traded_symbols', lambda *args: probes.append(args) or ([], True))
+    discovered, probed = binance_spot_hist.discover_binance_symbols('key', 'secret', 'Test', START, END)
+
+    assert probes == []
+    assert not probed
+    assert [item['symbol'] for item in discovered] == ['SOLUSDT']
+
+
+def test_probe_keeps_a_symbol_whose_request_times_out(monkeypatch):
+    def trades_from_id(key, secret, symbol, from_id):
+        if symbol == 'ETHUSDT':
+            raise requests.exceptions.ReadTimeout('timed out')
+        return []
+    monkeypatch.setattr(binance_spot_hist, 'get_binance_trades_from_id', trades_from_id)
+
+    traded, complete = binance_spot_hist.probe_traded_symbols('key', 'secret', SYMBOLS)
+
+    assert [item['symbol'] for item in traded] == ['ETHUSDT']
+    assert not complete
@@ -0,0 +1,60 @@
+from db_func import db
+from db_func.models import SyncState, Transaction
+from db_func.funcs import add_txns_bulk, rebuild_position_snapshot, record_salted_cutoff, retire_salted_rows, SALTED_CUTOFF, search_transactions, create_search_index
+
+
+def make_row(exchange_id, position='SOLUSDT', txn_type='Buy', token_amt=1.5, txn_date='2024-03-01'):
+    return {
+        'exchange_id': exchange_id, 'txn_date': txn_date, 'position': position, 'txn_type': txn_type,
+        'pic': 'Test', 'exchange': 'binance', 'token_amt': token_amt, 'token_price': 100.0, 'usd_value': token_amt * 100.0,
+    }
+
+
+def test_refetched_rows_retire_their_salted_copies():
+    # Saved before the upgrade: two identical fills and a deposit, all under salted ids
+    add_txns_bulk([make_row('salted-1'), make_row('salted-2'), make_row('salted-3', position='SOL', txn_type='Deposit')])
+    SyncState.query.filter_by(pic=SALTED_CUTOFF[0], exchange=SALTED_CUTOFF[1], stream=SALTED_CUTOFF[2]).delete()
+    record_salted_cutoff()
+
+    # Re-fetched under deterministic ids: both fills again, plus a trade that is really new
+    add_txns_bulk([make_row('fill-1'), make_row('fill-2'), make_row('new-1', token_amt=2.0)])
+
+    assert retire_salted_rows() == 2
+
+    remaining = {txn.exchange_id for txn in Transaction.query.all()}
+    assert remaining == {'salted-3', 'fill-1', 'fill-2', 'new-1'}
+
+    # The position snapshot triggers follow the deletes
+    assert rebuild_position_snapshot()['mismatched'] == []
+
+    # Already matched rows are not looked at again
+    assert retire_salted_rows() == 0
+    assert db.session.query(Transaction).count() == 4
+
+
+def test_fresh_ledger_has_nothing_to_retire():
+    add_txns_bulk([make_row('fill-1')])
+
+    assert retire_salted_rows() == 0
+
+
+def test_search_matches_inside_values():
+    add_txns_bulk([make_row('abc-123'), make_row('def-456', position='ETHBTC')])
+
+    assert [txn.exchange_id for txn in search_transactions('USDT')] == ['abc-123']
+    assert [txn.exchange_id for txn in search_transactions('c-12')] == ['abc-123']
+    assert {txn.exchange_id for txn in search_transactions('binance')} == {'abc-123', 'def-456'}
+
+
+def test_word_tokenized_search_index_is_rebuilt_as_trigram():
+    add_txns_bulk([make_row('abc-123')])
+
+    # An index built by an older version with the default tokenizer
+    db.session.execute(db.text("DROP TABLE transaction_fts"))
+    db.session.execute(db.text("CREATE VIRTUAL TABLE transaction_fts USING fts5(pic, exchange, exchange_id, position, content='transaction', content_rowid='txn_id')"))
+    db.session.execute(db.text("INSERT INTO transaction_fts(transaction_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+    create_search_index()
+
+    assert [txn.exchange_id for txn in search_transactions('USDT')] == ['abc-123']
@@ -0,0 +1,147 @@
+import time
+
+import pandas as pd
+
+from exchanges_func import binance_spot_hist, bybit_spot_hist, http_client, ingestion, price_snapshot
+from db_func.funcs import count_transactions, get_sync_state
+
+
+def make_job(history_type, exchange='bybit'):
+    owner_data = {
+        'owner': 'TEST', 'pic': 'Test',
+        'bybit_api_key': 'key', 'bybit_secret_key': 'secret',
+        'bin_api_key': 'key', 'bin_secret_key': 'secret',
+    }
+    return {'owner': 'TEST', 'owner_data': owner_data, 'exchange': exchange, 'history_type': history_type}
+
+
+def test_failed_deposit_window_fails_the_job(monkeypatch):
+    job = make_job('deposits')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [job])
+
+    # Every page request fails, as on a non-200 response
+    monkeypatch.setattr(bybit_spot_hist, 'get_bybit_deposit', lambda *args: None)
+
+    progress = ingestion.run_ingestion(['TEST'], 'Weekly', False, exchanges=('bybit',))
+
+    entry = progress[ingestion.job_key(job)]
+    assert entry['status'] == 'failed'
+    assert 'could not be fetched' in entry['error']
+
+    # The high-water mark must not move past the missing window
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(job)) is None
+
+
+def test_complete_fetch_moves_the_high_water_mark(monkeypatch):
+    job = make_job('deposits')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [job])
+    monkeypatch.setattr(bybit_spot_hist, 'get_bybit_deposit', lambda *args: {'statusCode': 200, 'body': {'retCode': 0, 'result': {'rows': []}}})
+
+    # A first incremental sync covers the whole initial range, so it may set the mark
+    progress = ingestion.run_ingestion(['TEST'], 'Incremental', False, exchanges=('bybit',))
+
+    assert progress[ingestion.job_key(job)]['status'] == 'done'
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(job)) is not None
+
+
+def test_swallowed_trade_error_keeps_the_high_water_mark(monkeypatch):
+    job = make_job('trades', exchange='binance')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [job])
+    monkeypatch.setattr(binance_spot_hist, 'discover_binance_symbols', lambda *args: ([{'symbol': 'SOLUSDT'}], False))
+
+    # An error response for the symbol, the fetch returns without raising
+    monkeypatch.setattr(binance_spot_hist, 'get_binance_trades_from_id', lambda *args: None)
+
+    progress = ingestion.run_ingestion(['TEST'], 'Weekly', False, trade_fetch='cursor', exchanges=('binance',))
+
+    assert progress[ingestion.job_key(job)]['status'] == 'failed'
+    assert get_sync_state('Test', 'binance', ingestion.hwm_stream(job)) is None
+
+
+def test_batch_without_complete_coverage_keeps_the_high_water_mark(monkeypatch):
+    job = make_job('deposits')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [job])
+
+    # A fetch that returns normally but does not report covering its range
+    monkeypatch.setattr(bybit_spot_hist, 'fetch_history', lambda *args: pd.DataFrame())
+
+    progress = ingestion.run_ingestion(['TEST'], 'Incremental', False, exchanges=('bybit',))
+
+    assert progress[ingestion.job_key(job)]['status'] == 'failed'
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(job)) is None
+
+
+def test_unpriced_deposit_is_not_saved_and_keeps_the_high_water_mark(monkeypatch):
+    job = make_job('deposits')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [job])
+
+    deposit = {'coin': 'SOL', 'successAt': '1700000000000', 'amount': '1.5', 'txID': 'tx-1'}
+    monkeypatch.setattr(bybit_spot_hist, 'get_bybit_deposit', lambda *args: {'statusCode': 200, 'body': {'retCode': 0, 'result': {'rows': [deposit]}}})
+
+    # The kline request for its price fails
+    monkeypatch.setattr(http_client, 'get_many', lambda exchange, requests, weight=1: [None for _ in requests])
+
+    progress = ingestion.run_ingestion(['TEST'], 'Incremental', False, exchanges=('bybit',))
+
+    assert progress[ingestion.job_key(job)]['status'] == 'failed'
+    assert count_transactions({}) == 0
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(job)) is None
+
+
+def test_failed_write_fails_its_job_and_keeps_draining(monkeypatch):
+    failing, working = make_job('deposits'), make_job('withdrawals')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [failing, working])
+    monkeypatch.setattr(bybit_spot_hist, 'get_bybit_deposit', lambda *args: {'statusCode': 200, 'body': {'retCode': 0, 'result': {'rows': []}}})
+    monkeypatch.setattr(bybit_spot_hist, 'get_bybit_withdraw', lambda *args: {'statusCode': 200, 'body': {'retCode': 0, 'result': {'rows': []}}})
+
+    def save_to_database(df):
+        if df.attrs.get('history_type') == 'deposits':
+            raise RuntimeError('database is locked')
+        return 0, 0
+    monkeypatch.setattr(bybit_spot_hist, 'save_to_database', save_to_database)
+
+    real_fetch = bybit_spot_hist.fetch_history
+    def fetch_history(owner_data, history_type, *args):
+        df = real_fetch(owner_data, history_type, *args)
+        df.attrs['history_type'] = history_type
+        return df
+    monkeypatch.setattr(bybit_spot_hist, 'fetch_history', fetch_history)
+
+    progress = ingestion.run_ingestion(['TEST'], 'Incremental', False, exchanges=('bybit',))
+
+    entry = progress[ingestion.job_key(failing)]
+    assert entry['status'] == 'failed'
+    assert 'database is locked' in entry['error']
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(failing)) is None
+
+    # The other job is still saved and marked
+    assert progress[ingestion.job_key(working)]['status'] == 'done'
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(working)) is not None
+
+
+def test_deposit_of_an_unlisted_coin_is_saved_at_zero(monkeypatch):
+    job = make_job('deposits')
+    monkeypatch.setattr(ingestion, 'build_jobs', lambda acc_owners, exchanges: [job])
+
+    # LDBTC has no USDT market on Bybit, it can never be priced
+    deposit = {'coin': 'LDBTC', 'successAt': '1700000000000', 'amount': '0.5', 'txID': 'tx-1'}
+    monkeypatch.setattr(bybit_spot_hist, 'get_bybit_deposit', lambda *args: {'statusCode': 200, 'body': {'retCode': 0, 'result': {'rows': [deposit]}}})
+    monkeypatch.setitem(price_snapshot._snapshots, 'bybit', (time.monotonic(), {'SOLUSDT': 150.0}))
+
+    calls = []
+    monkeypatch.setattr(http_client, 'get_many', lambda exchange, requests, weight=1: calls.extend(requests) or [None for _ in requests])
+
+    progress = ingestion.run_ingestion(['TEST'], 'Incremental', False, exchanges=('bybit',))
+
+    assert calls == []
+    assert progress[ingestion.job_key(job)]['status'] == 'done'
+    assert progress[ingestion.job_key(job)]['inserted'] == 1
+    assert get_sync_state('Test', 'bybit', ingestion.hwm_stream(job)) is not None
+
+
+def test_rate_limited_bybit_page_is_not_complete():
+    # A 200 response carrying Bybit's rate limit error
+    records, complete, pages = bybit_spot_hist.fetch_window(lambda *args: {'statusCode': 200, 'body': {'retCode': 10006, 'retMsg': 'Too many visits!', 'result': {}}}, 0, 1, 'list')
+
+    assert records == []
+    assert complete is False
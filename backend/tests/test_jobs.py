@@ -0,0 +1,48 @@
+import queue
+import threading
+import time
+
+from db_func import app
+from db_func.funcs import create_job, get_job, update_job
+from exchanges_func import jobs
+
+
+def idle_worker(monkeypatch):
+    # A fresh worker that never runs anything, so jobs stay where the test put them
+    monkeypatch.setattr(jobs, '_worker', None)
+    monkeypatch.setattr(jobs, '_job_queue', queue.Queue())
+    monkeypatch.setattr(jobs, 'worker_loop', lambda: None)
+
+
+def test_scheduler_start_fails_jobs_left_running(monkeypatch):
+    idle_worker(monkeypatch)
+    job = create_job('db_update', {'acc_owners': ['J'], 'mode': 'Incremental', 'trade_fetch': 'cursor'})
+    update_job(job.job_id, status='running')
+
+    jobs.start_scheduler(interval_minutes=0)
+
+    assert get_job(job.job_id).status == 'failed'
+
+
+def test_concurrent_enqueues_share_one_job(monkeypatch):
+    idle_worker(monkeypatch)
+
+    # Slow the insert down so every thread passes the active job check before the first one commits
+    def slow_create_job(*args):
+        time.sleep(0.1)
+        return create_job(*args)
+    monkeypatch.setattr(jobs, 'create_job', slow_create_job)
+
+    job_ids = []
+    def enqueue():
+        with app.app_context():
+            job_ids.append(jobs.enqueue_update(['J'], 'Incremental'))
+
+    threads = [threading.Thread(target=enqueue) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(job_ids)) == 1
+    assert jobs._job_queue.qsize() == 1
@@ -0,0 +1,26 @@
+import csv
+
+from db_func.funcs import count_transactions
+from exchanges_func import http_client
+from exchanges_func.manual_convert import process_manual
+
+
+def test_binance_import_keeps_its_ids_when_run_again(monkeypatch, tmp_path):
+    calls = []
+    def get_many(exchange, requests, weight=1):
+        calls.extend(params for url, params in requests)
+        return [[[params['startTime'] + second * 1000, 0, 0, 0, '150.0'] for second in range(1000)] for url, params in requests]
+    monkeypatch.setattr(http_client, 'get_many', get_many)
+
+    csv_path = tmp_path / 'binance.csv'
+    with open(csv_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['User_ID', 'UTC_Time', 'Account', 'Operation', 'Coin', 'Change'])
+        writer.writeheader()
+        writer.writerow({'User_ID': '18065187', 'UTC_Time': '2023-11-14 22:13:20', 'Account': 'Spot', 'Operation': 'Deposit', 'Coin': 'SOL', 'Change': '1.5'})
+
+    process_manual(csv_path, 'binance')
+    process_manual(csv_path, 'binance')
+
+    # Priced with 1s closes like the first imports were, so the second run adds nothing
+    assert calls[0]['interval'] == '1s'
+    assert count_transactions({}) == 1
@@ -0,0 +1,26 @@
+import time
+
+from exchanges_func import http_client, price_snapshot
+
+
+def test_failed_snapshot_is_not_refetched_during_backoff(monkeypatch):
+    monkeypatch.setattr(price_snapshot, '_snapshots', {})
+    monkeypatch.setattr(price_snapshot, '_failed_at', {})
+
+    calls = []
+    def fetch_json(exchange, url, params=None, weight=1):
+        calls.append(url)
+        return None # offline
+    monkeypatch.setattr(http_client, 'fetch_json', fetch_json)
+
+    for _ in range(5):
+        assert price_snapshot.get_price_snapshot('binance') == {}
+    assert len(calls) == 1
+
+    # Retried once the backoff has passed
+    later = time.monotonic() + price_snapshot.BACKOFF + 1
+    monkeypatch.setattr(price_snapshot.time, 'monotonic', lambda: later)
+    monkeypatch.setattr(http_client, 'fetch_json', lambda exchange, url, params=None, weight=1: calls.append(url) or [{'symbol': 'SOLUSDT', 'price': '150.0'}])
+
+    assert price_snapshot.get_price_snapshot('binance') == {'SOLUSDT': 150.0}
+    assert len(calls) == 2
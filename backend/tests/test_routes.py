@@ -0,0 +1,96 @@
+import importlib
+import time
+
+import pytest
+
+from db_func import app, db
+from db_func.funcs import add_txns_bulk, get_sync_state
+from db_func.ledger_snapshot import WATERMARK, write_ledger_snapshot
+from exchanges_func import price_snapshot
+import routes  # noqa: F401, registers the routes
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def add_rows(count):
+    add_txns_bulk([
+        {
+            'exchange_id': f"id-{i}", 'txn_date': f"2024-01-{i + 1:02d}", 'position': 'SOLUSDT', 'txn_type': 'Buy',
+            'pic': 'Test', 'exchange': 'bybit', 'token_amt': 1.0, 'token_price': 100.0, 'usd_value': 100.0,
+        }
+        for i in range(count)
+    ])
+
+
+@pytest.mark.parametrize('limit', ['0', '-5', 'abc'])
+def test_all_transaction_clamps_bad_limits(client, limit):
+    add_rows(3)
+
+    response = client.get(f"/all_transaction?limit={limit}")
+
+    assert response.status_code == 200
+    assert response.get_json()['transactions']
+
+
+def test_all_transaction_pages_with_the_cursor(client):
+    add_rows(3)
+
+    first = client.get("/all_transaction?limit=2").get_json()
+    second = client.get(f"/all_transaction?limit=2&cursor={first['next_cursor']}").get_json()
+
+    assert len(first['transactions']) == 2
+    assert len(second['transactions']) == 1
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', ['abc|xyz', 'abc', '2024-01-02|'])
+def test_all_transaction_rejects_a_malformed_cursor(client, cursor):
+    response = client.get(f"/all_transaction?cursor={cursor}")
+
+    assert response.status_code == 400
+
+
+def test_startup_creates_tables_an_older_database_lacks(client):
+    # A site.db from before the position snapshot existed
+    db.session.execute(db.text("DROP TABLE position_snapshot"))
+    db.session.commit()
+
+    importlib.reload(importlib.import_module('main'))
+
+    assert client.get("/calc_pnl").status_code == 200
+
+
+def test_pnl_route_never_writes_the_ledger_snapshot(client, monkeypatch):
+    # Live prices come from a stubbed ticker snapshot, not from api.bybit.com
+    monkeypatch.setitem(price_snapshot._snapshots, 'bybit', (time.monotonic(), {'SOLUSDT': 150.0}))
+    add_rows(2)
+    write_ledger_snapshot()
+    add_rows(3) # id-0 and id-1 are skipped, id-2 is new and not in the snapshot yet
+
+    response = client.get("/calc_pnl?transactions=1")
+    transactions = response.get_json()['pic']['Test']['exchanges']['bybit']['tokens']['SOL']['transactions']
+
+    # Stale snapshot: read through the ORM instead, and leave the watermark alone
+    assert len(transactions) == 3
+    assert get_sync_state(*WATERMARK).last_id == 2
+
+
+def test_all_transaction_rejects_unknown_fields(client):
+    add_rows(1)
+
+    response = client.get("/all_transaction?fields=pic,bogus")
+
+    assert response.status_code == 400
+    assert 'bogus' in response.get_json()['error']
+    assert 'exchange_id' in response.get_json()['error']
+
+
+def test_all_transaction_returns_the_requested_fields(client):
+    add_rows(1)
+
+    response = client.get("/all_transaction?fields=pic,position")
+
+    assert response.get_json()['transactions'] == [{'pic': 'Test', 'position': 'SOLUSDT'}]
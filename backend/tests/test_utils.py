@@ -0,0 +1,52 @@
+import time
+
+from exchanges_func import http_client, price_cache, utils
+
+
+def fake_klines(calls):
+    def get_many(exchange, requests, weight=1):
+        calls.extend(params for url, params in requests)
+        return [[[params['startTime'] + minute * 60000, 0, 0, 0, '2.0'] for minute in range(1000)] for url, params in requests]
+    return get_many
+
+
+def test_binance_rows_within_hours_share_one_kline_request(monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, 'get_many', fake_klines(calls))
+
+    # 100 deposits spread over 12 hours
+    start = 1700000000000
+    pairs = [('SOL', start + i * 7 * 60 * 1000) for i in range(100)]
+
+    prices = utils.get_bin_hist_prices(pairs)
+
+    assert len(calls) == 1
+    assert calls[0]['interval'] == '1m'
+    assert set(prices.values()) == {2.0}
+
+
+def test_failed_kline_request_leaves_rows_unpriced(monkeypatch):
+    monkeypatch.setattr(http_client, 'get_many', lambda exchange, requests, weight=1: [None for _ in requests])
+
+    prices = utils.get_bybit_hist_prices([('SOL', 1700000000000), ('USDT', 1700000000000)])
+
+    assert prices[('SOL', 1700000000000)] is None
+    assert prices[('USDT', 1700000000000)] == 1.0
+
+
+def test_candle_missing_from_response_is_not_stored_as_zero(monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, 'get_many', lambda exchange, requests, weight=1: calls.extend(requests) or [[] for _ in requests])
+
+    pair = ('ETH', 1600000000000)
+    assert utils.get_bin_hist_prices([pair])[pair] is None
+    assert price_cache.get_cached_price('binance', 'ETH', '1m', price_cache.bucket_timestamp(pair[1], '1m')) is None
+
+    # Remembered as missing for a while, then asked for again
+    utils.get_bin_hist_prices([pair])
+    assert len(calls) == 1
+
+    later = time.monotonic() + price_cache.MISS_TTL + 1
+    monkeypatch.setattr(price_cache.time, 'monotonic', lambda: later)
+    utils.get_bin_hist_prices([pair])
+    assert len(calls) == 2
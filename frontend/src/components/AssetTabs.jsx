@@ -43,13 +43,34 @@ const AssetTabs = ({ tokenData, pic, exchange }) => {
   const tokens = Object.keys(tokenData);
   const [currentToken, setCurrentToken] = useState(tokens[0]);
   const [showTransactions, setShowTransactions] = useState(false);
+  const [tokenTransactions, setTokenTransactions] = useState({});
   const [selectedTabIndex, setSelectedTabIndex] = useState(0);
   const tabListRef = useRef(null);
 
   useEffect(() => {
     setSelectedTabIndex(0);
+    setCurrentToken(Object.keys(tokenData)[0]);
+    setTokenTransactions({});
   }, [pic, exchange]);
 
+  {/* Transactions are only loaded when a token's history is opened */}
+  useEffect(() => {
+    if (!showTransactions || !currentToken || tokenTransactions[currentToken]) return;
+
+    const fetchTokenTransactions = async () => {
+      try {
+        const params = new URLSearchParams({ pic, exchange, token: currentToken });
+        const response = await fetch(`http://13.229.173.120:5001/token_transactions?${params}`);
+        const data = await response.json();
+        setTokenTransactions((prev) => ({ ...prev, [currentToken]: data }));
+      } catch (error) {
+        console.error('Error fetching token transactions:', error);
+      }
+    };
+
+    fetchTokenTransactions();
+  }, [showTransactions, currentToken, pic, exchange, tokenTransactions]);
+
   const isScrollable = tokens.length > 10;
 
   {/* Tab Control */}
@@ -222,7 +243,7 @@ const AssetTabs = ({ tokenData, pic, exchange }) => {
 
                   {showTransactions && (
                     <TransactionEntry
-                      transactions={tokenData[token].transactions}
+                      transactions={tokenTransactions[token] || tokenData[token].transactions}
                       cardBg={cardBg}
                       textColor={textColor}
                     />
@@ -11,14 +11,46 @@ const Transactions = () => {
   const [error, setError] = useState(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [itemsPerPage, setItemsPerPage] = useState(10);
+  const [totalCount, setTotalCount] = useState(0);
+  /* cursors[n] is the keyset cursor that loads page n + 1 */
+  const [cursors, setCursors] = useState([null]);
+
+  useEffect(() => {
+    const fetchCount = async () => {
+      try {
+        const response = await axios.get(
+          "http://13.229.173.120:5001/transaction_count"
+        );
+        setTotalCount(response.data.total);
+      } catch (err) {
+        setError("Failed to fetch transaction data");
+      }
+    };
+
+    fetchCount();
+  }, []);
 
   useEffect(() => {
     const fetchTransactions = async () => {
+      setIsLoading(true);
       try {
+        const params = { limit: itemsPerPage };
+        const cursor = cursors[currentPage - 1];
+        if (cursor) params.cursor = cursor;
+
         const response = await axios.get(
-          "http://13.229.173.120:5001/all_transaction"
+          "http://13.229.173.120:5001/all_transaction",
+          { params }
         );
-        setTransactions(response.data);
+        setTransactions(response.data.transactions);
+
+        /* Remember where the next page starts */
+        const nextCursor = response.data.next_cursor;
+        setCursors((prev) => {
+          const updated = prev.slice(0, currentPage);
+          if (nextCursor) updated.push(nextCursor);
+          return updated;
+        });
         setIsLoading(false);
       } catch (err) {
         setError("Failed to fetch transaction data");
@@ -27,19 +59,15 @@ const Transactions = () => {
     };
 
     fetchTransactions();
-  }, []);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [currentPage, itemsPerPage]);
 
   /* Pagination Controls */
   const totalPages = useMemo(() => {
-    if (itemsPerPage === 'all') return 1;
-    return Math.ceil(transactions.length / Number(itemsPerPage));
-  }, [transactions, itemsPerPage]);
+    return Math.max(1, Math.ceil(totalCount / Number(itemsPerPage)));
+  }, [totalCount, itemsPerPage]);
 
-  const currentTransactions = useMemo(() => {
-    if (itemsPerPage === 'all') return transactions;
-    const startIndex = (currentPage - 1) * Number(itemsPerPage);
-    return transactions.slice(startIndex, startIndex + Number(itemsPerPage));
-  }, [transactions, currentPage, itemsPerPage]);
+  const hasNextPage = cursors.length > currentPage;
 
   const handlePageChange = (newPage) => {
     setCurrentPage(newPage);
@@ -47,6 +75,7 @@ const Transactions = () => {
 
   const handleItemsPerPageChange = (event) => {
     setItemsPerPage(event.target.value);
+    setCursors([null]);
     setCurrentPage(1); // Reset to first page when changing items per page
   };
 
@@ -70,7 +99,7 @@ const Transactions = () => {
         bg={useColorModeValue("gray.200", "gray.700")}
       >
         <TransactionTable
-          transactions={currentTransactions}
+          transactions={transactions}
           isLoading={isLoading}
           error={error}
         />
@@ -87,7 +116,6 @@ const Transactions = () => {
             <option value="50">50</option>
             <option value="100">100</option>
             <option value="1000">1000</option>
-            <option value="all">All</option>
           </Select>
           <Button
             onClick={() => handlePageChange(currentPage - 1)}
@@ -98,7 +126,7 @@ const Transactions = () => {
           <Text>{`Page ${currentPage} of ${totalPages}`}</Text>
           <Button
             onClick={() => handlePageChange(currentPage + 1)}
-            isDisabled={currentPage === totalPages}
+            isDisabled={!hasNextPage}
           >
             Next
           </Button>